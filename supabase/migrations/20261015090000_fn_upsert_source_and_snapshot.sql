@@ -0,0 +1,97 @@
+-- Fused source_record upsert + snapshot insert.
+-- Called by the worker via POST /rest/v1/rpc/fn_upsert_source_and_snapshot {"rows": [...]}
+-- so both writes cost one round trip and share one transaction.
+-- Each row carries the source_record columns (payload, payload_hash, last_seen_at included);
+-- the snapshot row is derived from the same element.
+
+begin;
+
+create or replace function public.fn_upsert_source_and_snapshot(rows jsonb)
+returns integer
+language plpgsql
+as $$
+declare
+  affected integer;
+begin
+  -- Last occurrence wins when the same (source_type, source_id) appears twice in a batch,
+  -- otherwise ON CONFLICT DO UPDATE would touch the same row twice and fail.
+  with input as (
+    select distinct on (r.source_type, r.source_id) r.*
+    from jsonb_array_elements(rows) with ordinality as e(item, ord)
+    cross join lateral jsonb_populate_record(null::public.source_record, e.item) as r
+    order by r.source_type, r.source_id, e.ord desc
+  )
+  insert into public.source_record (
+    source_type,
+    source_id,
+    category_id,
+    course_id,
+    term_id,
+    user_id,
+    user_name,
+    company_name,
+    dept_name,
+    job_position,
+    status,
+    status_msg,
+    code_name,
+    ds_date,
+    gc_date,
+    sjc_date,
+    update_time,
+    payload,
+    payload_hash,
+    last_seen_at
+  )
+  select
+    source_type,
+    source_id,
+    category_id,
+    course_id,
+    term_id,
+    user_id,
+    user_name,
+    company_name,
+    dept_name,
+    job_position,
+    status,
+    status_msg,
+    code_name,
+    ds_date,
+    gc_date,
+    sjc_date,
+    update_time,
+    coalesce(payload, '{}'::jsonb),
+    payload_hash,
+    coalesce(last_seen_at, now())
+  from input
+  on conflict (source_type, source_id) do update set
+    category_id = excluded.category_id,
+    course_id = excluded.course_id,
+    term_id = excluded.term_id,
+    user_id = excluded.user_id,
+    user_name = excluded.user_name,
+    company_name = excluded.company_name,
+    dept_name = excluded.dept_name,
+    job_position = excluded.job_position,
+    status = excluded.status,
+    status_msg = excluded.status_msg,
+    code_name = excluded.code_name,
+    ds_date = excluded.ds_date,
+    gc_date = excluded.gc_date,
+    sjc_date = excluded.sjc_date,
+    update_time = excluded.update_time,
+    payload = excluded.payload,
+    payload_hash = excluded.payload_hash,
+    last_seen_at = excluded.last_seen_at;
+  get diagnostics affected = row_count;
+
+  insert into public.snapshot (source_type, source_id, snapshot_hash, payload)
+  select x.source_type, x.source_id, x.payload_hash, coalesce(x.payload, '{}'::jsonb)
+  from jsonb_to_recordset(rows) as x(source_type text, source_id text, payload jsonb, payload_hash text);
+
+  return affected;
+end;
+$$;
+
+commit;
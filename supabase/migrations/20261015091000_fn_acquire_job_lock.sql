@@ -0,0 +1,30 @@
+-- Single round-trip job lock acquisition.
+-- Called by the worker via POST /rest/v1/rpc/fn_acquire_job_lock
+-- {"p_job_name": ..., "p_locked_by": ..., "p_ttl_seconds": ...}.
+-- Inserts the lock, or takes it over when it is expired or already ours (ttl refresh).
+-- Returns true when the caller holds the lock afterwards.
+
+begin;
+
+create or replace function public.fn_acquire_job_lock(
+  p_job_name text,
+  p_locked_by text,
+  p_ttl_seconds integer
+)
+returns boolean
+language sql
+as $$
+  with acquired as (
+    insert into public.job_lock as l (job_name, locked_by, locked_at, lock_expires_at)
+    values (p_job_name, p_locked_by, now(), now() + make_interval(secs => greatest(p_ttl_seconds, 1)))
+    on conflict (job_name) do update set
+      locked_by = excluded.locked_by,
+      locked_at = excluded.locked_at,
+      lock_expires_at = excluded.lock_expires_at
+    where l.lock_expires_at < now() or l.locked_by = excluded.locked_by
+    returning 1
+  )
+  select exists (select 1 from acquired);
+$$;
+
+commit;
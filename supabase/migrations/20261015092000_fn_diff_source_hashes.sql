@@ -0,0 +1,22 @@
+-- Server-side payload_hash comparison for the worker's change detection.
+-- Called via POST /rest/v1/rpc/fn_diff_source_hashes
+-- {"rows": [{"source_type": ..., "source_id": ..., "payload_hash": ...}, ...]}.
+-- Returns only the input keys whose stored hash differs; payload_hash is the stored
+-- value, or null when the key does not exist yet (NEW). Unchanged keys are omitted.
+
+begin;
+
+create or replace function public.fn_diff_source_hashes(rows jsonb)
+returns table (source_type text, source_id text, payload_hash text)
+language sql
+stable
+as $$
+  select x.source_type, x.source_id, s.payload_hash
+  from jsonb_to_recordset(rows) as x(source_type text, source_id text, payload_hash text)
+  left join public.source_record s
+    on s.source_type = x.source_type
+   and s.source_id = x.source_id
+  where s.payload_hash is distinct from x.payload_hash;
+$$;
+
+commit;
@@ -0,0 +1,10 @@
+-- Supports the worker's batched alert cooldown lookup:
+--   GET /alert?source_type=in.(...)&source_id=in.(...)&alert_type=in.(...)&created_at=gte.<since>
+-- Without it every cooldown check scans alert, which only grows.
+
+begin;
+
+create index if not exists idx_alert_cooldown
+  on public.alert (source_type, source_id, alert_type, created_at desc);
+
+commit;
@@ -0,0 +1,60 @@
+-- Source batch persist: source_record upsert + snapshot insert + alert insert + sheet_outbox enqueue.
+-- Called by the worker via POST /rest/v1/rpc/fn_persist_source_batch {"rows": [...], "alerts": [...], "outbox": [...]}
+-- so business rows, alerts and their outbox rows land in one transaction and one round trip.
+-- rows uses the fn_upsert_source_and_snapshot element shape; outbox rows already carry row_key.
+
+begin;
+
+create or replace function public.fn_persist_source_batch(
+  rows jsonb,
+  alerts jsonb default '[]'::jsonb,
+  outbox jsonb default '[]'::jsonb
+)
+returns integer
+language plpgsql
+as $$
+declare
+  affected integer;
+begin
+  affected := public.fn_upsert_source_and_snapshot(rows);
+
+  insert into public.alert (
+    source_type,
+    source_id,
+    alert_type,
+    severity,
+    title,
+    message,
+    detail,
+    review_status,
+    resolved
+  )
+  select
+    a.source_type,
+    a.source_id,
+    a.alert_type,
+    coalesce(a.severity, 'medium'),
+    a.title,
+    a.message,
+    coalesce(a.detail, '{}'::jsonb),
+    coalesce(a.review_status, 'AUTO'),
+    coalesce(a.resolved, false)
+  from jsonb_populate_recordset(null::public.alert, coalesce(alerts, '[]'::jsonb)) as a;
+
+  insert into public.sheet_outbox (source_type, source_id, row_key, payload)
+  select distinct on (o.row_key)
+    o.source_type,
+    o.source_id,
+    o.row_key,
+    coalesce(o.payload, '{}'::jsonb)
+  from jsonb_populate_recordset(null::public.sheet_outbox, coalesce(outbox, '[]'::jsonb)) as o
+  where not exists (
+    select 1 from public.sheet_outbox s where s.row_key = o.row_key
+  )
+  order by o.row_key;
+
+  return affected;
+end;
+$$;
+
+commit;
@@ -0,0 +1,80 @@
+-- Unique outbox keys so enqueue dedup happens in the insert itself:
+--   POST /rest/v1/sheet_outbox?on_conflict=row_key
+--   POST /rest/v1/notification_outbox?on_conflict=source_type,source_id,template_code,recipient
+-- both with Prefer: resolution=ignore-duplicates (ON CONFLICT DO NOTHING), replacing the
+-- read-then-write existence checks. Duplicates left by earlier races are removed first,
+-- keeping the oldest row.
+
+begin;
+
+delete from public.sheet_outbox s
+using public.sheet_outbox d
+where s.row_key = d.row_key
+  and s.id > d.id;
+
+create unique index if not exists uq_sheet_outbox_row_key
+  on public.sheet_outbox (row_key);
+
+delete from public.notification_outbox n
+using public.notification_outbox d
+where n.source_type = d.source_type
+  and n.source_id = d.source_id
+  and n.template_code = d.template_code
+  and n.recipient = d.recipient
+  and n.id > d.id;
+
+create unique index if not exists uq_notification_outbox_key
+  on public.notification_outbox (source_type, source_id, template_code, recipient);
+
+-- fn_persist_source_batch: let the unique index skip queued row keys instead of NOT EXISTS.
+create or replace function public.fn_persist_source_batch(
+  rows jsonb,
+  alerts jsonb default '[]'::jsonb,
+  outbox jsonb default '[]'::jsonb
+)
+returns integer
+language plpgsql
+as $$
+declare
+  affected integer;
+begin
+  affected := public.fn_upsert_source_and_snapshot(rows);
+
+  insert into public.alert (
+    source_type,
+    source_id,
+    alert_type,
+    severity,
+    title,
+    message,
+    detail,
+    review_status,
+    resolved
+  )
+  select
+    a.source_type,
+    a.source_id,
+    a.alert_type,
+    coalesce(a.severity, 'medium'),
+    a.title,
+    a.message,
+    coalesce(a.detail, '{}'::jsonb),
+    coalesce(a.review_status, 'AUTO'),
+    coalesce(a.resolved, false)
+  from jsonb_populate_recordset(null::public.alert, coalesce(alerts, '[]'::jsonb)) as a;
+
+  insert into public.sheet_outbox (source_type, source_id, row_key, payload)
+  select distinct on (o.row_key)
+    o.source_type,
+    o.source_id,
+    o.row_key,
+    coalesce(o.payload, '{}'::jsonb)
+  from jsonb_populate_recordset(null::public.sheet_outbox, coalesce(outbox, '[]'::jsonb)) as o
+  order by o.row_key
+  on conflict (row_key) do nothing;
+
+  return affected;
+end;
+$$;
+
+commit;
@@ -0,0 +1,11 @@
+-- Supports the worker's cooldown probe before large batched lookups:
+--   GET /alert?select=id&created_at=gte.<since>&limit=1
+-- idx_alert_cooldown leads with source_type, so without this the probe scans alert
+-- whenever the window is empty.
+
+begin;
+
+create index if not exists idx_alert_created_at
+  on public.alert (created_at desc);
+
+commit;
@@ -2,10 +2,11 @@ from __future__ import annotations
 
 import asyncio
 import time
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any
 
 import httpx
+import orjson
 
 from .config import Settings
 
@@ -16,6 +17,10 @@ class TokenBundle:
     access_token: str
     refresh_token: str
     expires_at_ms: int
+    header: dict[str, str] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.header = {"Authorization": f"{self.grant_type} {self.access_token}"}
 
     @classmethod
     def from_login_response(cls, payload: dict[str, Any]) -> "TokenBundle":
@@ -31,30 +36,83 @@ class KVCAAuthManager:
     def __init__(self, settings: Settings, client: httpx.AsyncClient) -> None:
         self._settings = settings
         self._client = client
-        self._token: TokenBundle | None = None
+        # (token, refresh_at_ns, expires_at_ns) swapped as one reference, so the lock-free
+        # fast path never sees a token paired with another token's deadlines.
+        self._token_ref: tuple[TokenBundle, int, int] | None = None
         self._lock = asyncio.Lock()
+        self._refresh_task: asyncio.Task[None] | None = None
+        self._last_refresh_failed = False
 
     async def get_auth_header(self) -> dict[str, str]:
-        token = await self._get_valid_token()
-        return {"Authorization": f"{token.grant_type} {token.access_token}"}
+        return (await self._get_valid_token()).header
 
-    async def force_relogin(self) -> None:
+    async def force_relogin(self, rejected_header: dict[str, str] | None = None) -> None:
         async with self._lock:
-            self._token = None
-            self._token = await self._login()
+            ref = self._token_ref
+            if rejected_header is not None and ref is not None and ref[0].header != rejected_header:
+                # Single-flight: a concurrent 401 already replaced the rejected token.
+                return
+            self._token_ref = None
+            self._set_token(await self._login())
+
+    async def aclose(self) -> None:
+        task = self._refresh_task
+        self._refresh_task = None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
 
     async def _get_valid_token(self) -> TokenBundle:
-        if self._token is not None and not self._is_expiring_soon(self._token):
-            return self._token
+        ref = self._token_ref
+        if ref is not None and time.monotonic_ns() < ref[1]:
+            return ref[0]
+        return await self._refresh_token()
+
+    async def _refresh_token(self) -> TokenBundle:
+        # STALE: keep serving the token and refresh it in the background.
+        # EXPIRED (or last background refresh failed): block on login.
+        ref = self._token_ref
+        if ref is not None and not self._last_refresh_failed and time.monotonic_ns() < ref[2]:
+            self._schedule_background_refresh()
+            return ref[0]
+        async with self._lock:
+            ref = self._token_ref
+            if ref is None or self._last_refresh_failed or time.monotonic_ns() >= ref[2]:
+                return self._set_token(await self._login())
+            return ref[0]
+
+    def _schedule_background_refresh(self) -> None:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._background_login())
+
+    async def _background_login(self) -> None:
         async with self._lock:
-            if self._token is None or self._is_expiring_soon(self._token):
-                self._token = await self._login()
-            return self._token
+            # Another caller may have logged in while we waited for the lock.
+            ref = self._token_ref
+            if ref is not None and time.monotonic_ns() < ref[1]:
+                return
+            try:
+                self._set_token(await self._login())
+            except Exception:
+                # Keep serving the still-valid token; next call refreshes synchronously.
+                self._last_refresh_failed = True
 
-    def _is_expiring_soon(self, token: TokenBundle) -> bool:
-        now_ms = int(time.time() * 1000)
+    def _set_token(self, token: TokenBundle) -> TokenBundle:
+        # expires_at_ms is wall-clock; convert the deadlines to the monotonic clock once
+        # so the per-request check is a single integer comparison.
+        remaining_ms = token.expires_at_ms - int(time.time() * 1000)
+        now_ns = time.monotonic_ns()
         skew_ms = self._settings.kvca_token_skew_seconds * 1000
-        return now_ms + skew_ms >= token.expires_at_ms
+        expires_ns = now_ns + (remaining_ms - skew_ms) * 1_000_000
+        # Short-lived tokens (< 3x skew) would be stale on arrival and trigger a login
+        # per call; refresh those halfway to the deadline instead.
+        stale_ns = max(now_ns + (remaining_ms - 3 * skew_ms) * 1_000_000, (now_ns + expires_ns) // 2)
+        self._token_ref = (token, min(stale_ns, expires_ns), expires_ns)
+        self._last_refresh_failed = False
+        return token
 
     async def _login(self) -> TokenBundle:
         payload = {
@@ -64,5 +122,5 @@ class KVCAAuthManager:
         }
         response = await self._client.post("/api/auth/login", json=payload)
         response.raise_for_status()
-        data = response.json()
+        data = orjson.loads(response.content)
         return TokenBundle.from_login_response(data)
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
 import os
+import re
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Iterator
 from urllib.parse import urlsplit
 
 
@@ -35,30 +37,66 @@ def _read_optional_str(name: str) -> str | None:
     return text if text else None
 
 
-def _load_env_file() -> None:
-    candidates: list[Path] = []
-    explicit = os.getenv("KVCA_ENV_FILE")
+# KEY=value, KEY="value" or KEY='value' per line; comment lines are skipped.
+_ENV_LINE = re.compile(
+    r"""^(?![ \t]*#)[ \t]*([A-Za-z_][A-Za-z0-9_]*)[ \t]*=[ \t]*(?:"([^"\n]*)"|'([^'\n]*)'|(.*?))[ \t]*$""",
+    re.MULTILINE,
+)
+
+# Resolved env file per (KVCA_ENV_FILE, cwd), and the last Settings keyed by that
+# file's path + mtime. Environment variables set after the first load are not
+# picked up until the env file changes.
+_ENV_FILE_CACHE: dict[tuple[str | None, str], Path | None] = {}
+_SETTINGS_CACHE: tuple[tuple[Path | None, float | None], Settings] | None = None
+# Values this module copied from the env file into os.environ; a reload may replace
+# these, but never a variable that was set in the real environment.
+_ENV_FILE_VALUES: dict[str, str] = {}
+
+
+def _env_file_candidates(explicit: str | None, cwd: Path) -> Iterator[Path]:
     if explicit:
-        candidates.append(Path(explicit))
+        yield Path(explicit)
+    yield cwd / ".env"
+    yield Path(__file__).resolve().parents[2] / ".env"
+
+
+def _find_env_file() -> Path | None:
+    explicit = os.getenv("KVCA_ENV_FILE")
+    cwd = Path.cwd()
+    cache_key = (explicit, str(cwd))
+    cached = _ENV_FILE_CACHE.get(cache_key)
+    if cached is None or not cached.is_file():
+        _ENV_FILE_CACHE[cache_key] = next(
+            (path for path in _env_file_candidates(explicit, cwd) if path.is_file()),
+            None,
+        )
+    return _ENV_FILE_CACHE[cache_key]
 
-    candidates.append(Path.cwd() / ".env")
-    candidates.append(Path(__file__).resolve().parents[2] / ".env")
 
-    env_path = next((path for path in candidates if path.exists() and path.is_file()), None)
+def _env_file_mtime(env_path: Path | None) -> float | None:
+    if env_path is None:
+        return None
+    try:
+        return env_path.stat().st_mtime
+    except OSError:
+        return None
+
+
+def _load_env_file(env_path: Path | None) -> None:
     if env_path is None:
         return
 
-    for raw_line in env_path.read_text(encoding="utf-8").splitlines():
-        line = raw_line.strip()
-        if not line or line.startswith("#"):
-            continue
-        if "=" not in line:
-            continue
-        key, value = line.split("=", 1)
-        key = key.strip()
-        value = value.strip().strip('"').strip("'")
-        if key:
-            os.environ.setdefault(key, value)
+    try:
+        text = env_path.read_text(encoding="utf-8")
+    except OSError:
+        return
+    for match in _ENV_LINE.finditer(text):
+        key, double_quoted, single_quoted, bare = match.groups()
+        value = double_quoted or single_quoted or bare or ""
+        current = os.environ.get(key)
+        if current is None or (key in _ENV_FILE_VALUES and current == _ENV_FILE_VALUES[key]):
+            os.environ[key] = value
+            _ENV_FILE_VALUES[key] = value
 
 
 def _normalize_base_url(raw: str) -> str:
@@ -81,16 +119,24 @@ class Settings:
     kvca_request_timeout_ms: int
     kvca_token_skew_seconds: int
     kvca_retry_on_401: bool
+    kvca_reference_cache_ttl_seconds: int
     kvca_sync_default_category_id: int | None
     kvca_max_users_per_course: int | None
+    kvca_concurrency: int
     worker_log_level: str
+    http_pool_max_connections: int
+    http_pool_max_keepalive: int
     supabase_url: str | None
     supabase_service_role_key: str | None
     supabase_request_timeout_ms: int
+    supabase_write_concurrency: int
+    supabase_gzip_requests: bool
+    supabase_max_retries: int
     alert_cooldown_minutes: int
     job_lock_ttl_seconds: int
     sheet_dispatch_batch_size: int
     noti_dispatch_batch_size: int
+    outbox_dispatch_concurrency: int
     outbox_retry_base_seconds: int
     outbox_retry_max_seconds: int
     sheet_webhook_url: str | None
@@ -100,7 +146,18 @@ class Settings:
 
     @classmethod
     def from_env(cls) -> "Settings":
-        _load_env_file()
+        global _SETTINGS_CACHE
+        env_path = _find_env_file()
+        cache_key = (env_path, _env_file_mtime(env_path))
+        if _SETTINGS_CACHE is not None and _SETTINGS_CACHE[0] == cache_key:
+            return _SETTINGS_CACHE[1]
+        _load_env_file(env_path)
+        settings = cls._from_environ()
+        _SETTINGS_CACHE = (cache_key, settings)
+        return settings
+
+    @classmethod
+    def _from_environ(cls) -> "Settings":
         supabase_url_raw = os.getenv("SUPABASE_URL")
         supabase_url = _normalize_base_url(supabase_url_raw) if supabase_url_raw else None
         supabase_service_role_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
@@ -113,16 +170,24 @@ class Settings:
             kvca_request_timeout_ms=int(os.getenv("KVCA_REQUEST_TIMEOUT_MS", "15000")),
             kvca_token_skew_seconds=int(os.getenv("KVCA_TOKEN_SKEW_SECONDS", "60")),
             kvca_retry_on_401=_parse_bool(os.getenv("KVCA_RETRY_ON_401"), True),
+            kvca_reference_cache_ttl_seconds=int(os.getenv("KVCA_REFERENCE_CACHE_TTL_SECONDS", "60")),
             kvca_sync_default_category_id=_read_optional_int("KVCA_SYNC_DEFAULT_CATEGORY_ID"),
             kvca_max_users_per_course=_read_optional_int("KVCA_MAX_USERS_PER_COURSE"),
+            kvca_concurrency=int(os.getenv("KVCA_CONCURRENCY", "8")),
             worker_log_level=os.getenv("WORKER_LOG_LEVEL", "INFO"),
+            http_pool_max_connections=int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "100")),
+            http_pool_max_keepalive=int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "100")),
             supabase_url=supabase_url,
             supabase_service_role_key=supabase_service_role_key,
             supabase_request_timeout_ms=int(os.getenv("SUPABASE_REQUEST_TIMEOUT_MS", "15000")),
+            supabase_write_concurrency=int(os.getenv("SUPABASE_WRITE_CONCURRENCY", "8")),
+            supabase_gzip_requests=_parse_bool(os.getenv("SUPABASE_GZIP_REQUESTS"), False),
+            supabase_max_retries=int(os.getenv("SUPABASE_MAX_RETRIES", "3")),
             alert_cooldown_minutes=int(os.getenv("ALERT_COOLDOWN_MINUTES", "30")),
             job_lock_ttl_seconds=int(os.getenv("JOB_LOCK_TTL_SECONDS", "900")),
             sheet_dispatch_batch_size=int(os.getenv("SHEET_DISPATCH_BATCH_SIZE", "50")),
             noti_dispatch_batch_size=int(os.getenv("NOTI_DISPATCH_BATCH_SIZE", "50")),
+            outbox_dispatch_concurrency=int(os.getenv("OUTBOX_DISPATCH_CONCURRENCY", "16")),
             outbox_retry_base_seconds=int(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "60")),
             outbox_retry_max_seconds=int(os.getenv("OUTBOX_RETRY_MAX_SECONDS", "3600")),
             sheet_webhook_url=_read_optional_str("SHEET_WEBHOOK_URL"),
@@ -1,37 +1,74 @@
 from __future__ import annotations
 
+import time
+from collections import OrderedDict
 from typing import Any
 
 import httpx
+import orjson
 
 from .auth import KVCAAuthManager
 from .config import Settings
 
+_COURSE_CACHE_MAX_ENTRIES = 128
+
 
 class KVCAClient:
     def __init__(self, settings: Settings) -> None:
         self._settings = settings
         timeout = httpx.Timeout(settings.kvca_request_timeout_ms / 1000)
-        self._http = httpx.AsyncClient(base_url=settings.kvca_base_url, timeout=timeout)
+        limits = httpx.Limits(
+            max_connections=settings.http_pool_max_connections,
+            max_keepalive_connections=settings.http_pool_max_keepalive,
+            keepalive_expiry=60,
+        )
+        self._http = httpx.AsyncClient(
+            base_url=settings.kvca_base_url,
+            timeout=timeout,
+            limits=limits,
+            http2=True,
+            headers={"Content-Type": "application/json"},
+        )
         self._auth = KVCAAuthManager(settings, self._http)
+        # Category/course lists change slowly; cache them briefly across job calls.
+        self._cache_ttl = settings.kvca_reference_cache_ttl_seconds
+        self._category_cache: tuple[float, list[dict[str, Any]]] | None = None
+        self._course_cache: OrderedDict[int, tuple[float, list[dict[str, Any]]]] = OrderedDict()
 
     async def aclose(self) -> None:
+        await self._auth.aclose()
         await self._http.aclose()
 
     async def fetch_categories(self) -> list[dict[str, Any]]:
+        cached = self._category_cache
+        if cached is not None and time.monotonic() - cached[0] < self._cache_ttl:
+            return cached[1]
         data = await self._request_json("/api/category/list", {"categoryid": "all"})
+        categories: list[dict[str, Any]] = []
         if isinstance(data, list):
-            return [item for item in data if isinstance(item, dict)]
-        return []
+            categories = [item for item in data if isinstance(item, dict)]
+        if self._cache_ttl > 0:
+            self._category_cache = (time.monotonic(), categories)
+        return categories
 
     async def fetch_courses_by_category(self, category_id: int) -> list[dict[str, Any]]:
+        cached = self._course_cache.get(category_id)
+        if cached is not None and time.monotonic() - cached[0] < self._cache_ttl:
+            self._course_cache.move_to_end(category_id)
+            return cached[1]
         payload = {"categoryid": category_id}
         data = await self._request_json("/api/course/category/course", payload)
+        courses: list[dict[str, Any]] = []
         if isinstance(data, list):
-            return [item for item in data if isinstance(item, dict)]
-        if isinstance(data, dict):
-            return [item for item in data.values() if isinstance(item, dict)]
-        return []
+            courses = [item for item in data if isinstance(item, dict)]
+        elif isinstance(data, dict):
+            courses = [item for item in data.values() if isinstance(item, dict)]
+        if self._cache_ttl > 0:
+            self._course_cache[category_id] = (time.monotonic(), courses)
+            self._course_cache.move_to_end(category_id)
+            while len(self._course_cache) > _COURSE_CACHE_MAX_ENTRIES:
+                self._course_cache.popitem(last=False)
+        return courses
 
     async def fetch_class_status_all(self, course_id: int) -> list[dict[str, Any]]:
         data = await self._request_json("/api/course/classStatusAll", {"courseid": course_id})
@@ -47,11 +84,14 @@ class KVCAClient:
         return {}
 
     async def _request_json(self, path: str, payload: dict[str, Any]) -> Any:
+        body = orjson.dumps(payload)
         headers = await self._auth.get_auth_header()
-        response = await self._http.post(path, json=payload, headers=headers)
+        response = await self._http.post(path, content=body, headers=headers)
         if response.status_code == 401 and self._settings.kvca_retry_on_401:
-            await self._auth.force_relogin()
-            headers = await self._auth.get_auth_header()
-            response = await self._http.post(path, json=payload, headers=headers)
+            await self._auth.force_relogin(headers)
+            retry_headers = await self._auth.get_auth_header()
+            # Header dicts are cached per token, so identity tells us the token changed.
+            if retry_headers is not headers:
+                response = await self._http.post(path, content=body, headers=retry_headers)
         response.raise_for_status()
-        return response.json()
+        return orjson.loads(response.content)
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from contextlib import asynccontextmanager
+from dataclasses import asdict
 from typing import Any, Literal
 
 from fastapi import FastAPI, HTTPException
@@ -45,7 +46,7 @@ async def lifespan(app: FastAPI):
     app.state.settings = settings
     app.state.kvca_client = kvca_client
     app.state.storage = storage
-    app.state.sync_service = EnrolmentSyncService(kvca_client, storage)
+    app.state.sync_service = EnrolmentSyncService(kvca_client, storage, concurrency=settings.kvca_concurrency)
     try:
         yield
     finally:
@@ -99,7 +100,7 @@ async def dispatch_sheet_outbox(request: OutboxDispatchRequest) -> dict[str, Any
     storage: Storage = app.state.storage
     try:
         summary = await storage.dispatch_sheet_outbox(batch_size=request.batch_size)
-        return {"ok": True, "summary": summary.__dict__}
+        return {"ok": True, "summary": asdict(summary)}
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"Sheet outbox dispatch failed: {exc}") from exc
 
@@ -109,7 +110,7 @@ async def dispatch_notification_outbox(request: OutboxDispatchRequest) -> dict[s
     storage: Storage = app.state.storage
     try:
         summary = await storage.dispatch_notification_outbox(batch_size=request.batch_size)
-        return {"ok": True, "summary": summary.__dict__}
+        return {"ok": True, "summary": asdict(summary)}
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"Notification outbox dispatch failed: {exc}") from exc
 
@@ -123,8 +124,8 @@ async def dispatch_outbox_chain(request: OutboxChainRequest) -> dict[str, Any]:
         return {
             "ok": True,
             "summary": {
-                "sheet": sheet_summary.__dict__,
-                "notification": notification_summary.__dict__,
+                "sheet": asdict(sheet_summary),
+                "notification": asdict(notification_summary),
             },
         }
     except Exception as exc:
@@ -153,8 +154,8 @@ async def run_final_check(request: FinalCheckRequest) -> dict[str, Any]:
             "ok": True,
             "summary": {
                 "sync": summary_to_dict(sync_summary),
-                "sheet": sheet_summary.__dict__,
-                "notification": notification_summary.__dict__,
+                "sheet": asdict(sheet_summary),
+                "notification": asdict(notification_summary),
             },
         }
     except RuntimeError as exc:
@@ -3,22 +3,55 @@ from __future__ import annotations
 from typing import Any
 
 
-SENSITIVE_KEYS = {
-    "userPassword",
-    "juminNumber",
-    "refreshToken",
-    "accessToken",
-}
+SENSITIVE_KEYS = frozenset(
+    {
+        "userPassword",
+        "juminNumber",
+        "refreshToken",
+        "accessToken",
+    }
+)
+
+# Only containers can hold sensitive keys; leaves are skipped without a call.
+_CONTAINER_TYPES = (dict, list)
 
 
 def redact_sensitive(value: Any) -> Any:
+    # Containers without sensitive keys are returned as-is (no copy).
+    return _redact(value)[1]
+
+
+def _redact(value: Any) -> tuple[bool, Any]:
     if isinstance(value, dict):
-        sanitized: dict[str, Any] = {}
+        replaced: dict[Any, Any] | None = None
         for key, item in value.items():
-            if key in SENSITIVE_KEYS:
+            if not isinstance(item, _CONTAINER_TYPES):
                 continue
-            sanitized[key] = redact_sensitive(item)
-        return sanitized
+            changed, sanitized = _redact(item)
+            if changed:
+                if replaced is None:
+                    replaced = {}
+                replaced[key] = sanitized
+        if replaced is None:
+            if SENSITIVE_KEYS.isdisjoint(value):
+                return False, value
+            replaced = {}
+        return True, {
+            key: replaced[key] if key in replaced else item
+            for key, item in value.items()
+            if key not in SENSITIVE_KEYS
+        }
     if isinstance(value, list):
-        return [redact_sensitive(item) for item in value]
-    return value
+        items: list[Any] | None = None
+        for index, item in enumerate(value):
+            if not isinstance(item, _CONTAINER_TYPES):
+                continue
+            changed, sanitized = _redact(item)
+            if changed:
+                if items is None:
+                    items = list(value)
+                items[index] = sanitized
+        if items is None:
+            return False, value
+        return True, items
+    return False, value
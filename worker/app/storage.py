@@ -1,20 +1,33 @@
 from __future__ import annotations
 
+import asyncio
 from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+import gzip
 import hashlib
-import json
+from itertools import islice
+import logging
+from operator import attrgetter
+import random
 import re
-from typing import Any, Protocol
+import time
+from typing import Any, Iterable, Iterator, Protocol, TypeVar
 from urllib.parse import quote
 from uuid import uuid4
 
 import httpx
+import orjson
 
 from .config import Settings
 
+_T = TypeVar("_T")
 
-@dataclass
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True, frozen=True)
 class SourceRecordInput:
     source_type: str
     source_id: str
@@ -37,7 +50,53 @@ class SourceRecordInput:
     payload_hash: str
 
 
-@dataclass
+# PostgREST Prefer headers, shared so each request does not build its own dict.
+_RETURN_MINIMAL_HEADERS = {"Prefer": "return=minimal"}
+_RETURN_REPRESENTATION_HEADERS = {"Prefer": "return=representation"}
+_UPSERT_HEADERS = {"Prefer": "resolution=merge-duplicates,return=minimal"}
+_IGNORE_DUPLICATES_HEADERS = {"Prefer": "resolution=ignore-duplicates,return=minimal"}
+_IGNORE_DUPLICATES_REPRESENTATION_HEADERS = {"Prefer": "resolution=ignore-duplicates,return=representation"}
+_GZIP_HEADERS = {"Content-Encoding": "gzip"}
+_JSON_CONTENT_HEADERS = {"Content-Type": "application/json"}
+# Characters left unescaped in in.() filters; quote() always keeps [A-Za-z0-9_.~-].
+_IN_FILTER_SAFE = '(),"@:'
+# Request bodies below this size are sent uncompressed.
+_GZIP_MIN_BYTES = 4096
+_COOLDOWN_CACHE_MAX_ENTRIES = 50_000
+# Keys per batched cooldown lookup; above one chunk a cheap probe runs first.
+_COOLDOWN_KEYS_PER_QUERY = 100
+# Record count from which write-row preparation runs in a worker thread.
+_OFFLOAD_MIN_RECORDS = 1000
+
+# source_record columns written on upsert, in SourceRecordInput field order.
+_SOURCE_RECORD_COLUMNS = (
+    "source_type",
+    "source_id",
+    "category_id",
+    "course_id",
+    "term_id",
+    "user_id",
+    "user_name",
+    "company_name",
+    "dept_name",
+    "job_position",
+    "status",
+    "status_msg",
+    "code_name",
+    "ds_date",
+    "gc_date",
+    "sjc_date",
+    "update_time",
+    "payload",
+    "payload_hash",
+)
+_source_record_values = attrgetter(*_SOURCE_RECORD_COLUMNS)
+# snapshot columns and the SourceRecordInput attributes that feed them, pairwise.
+_SNAPSHOT_COLUMNS = ("source_type", "source_id", "snapshot_hash", "payload")
+_snapshot_values = attrgetter("source_type", "source_id", "payload_hash", "payload")
+
+
+@dataclass(slots=True, frozen=True)
 class PersistResult:
     upserted_count: int
     new_count: int
@@ -45,7 +104,18 @@ class PersistResult:
     alert_count: int
 
 
-@dataclass
+@dataclass(slots=True)
+class _WriteBatch:
+    source_rows: list[dict[str, Any]]
+    snapshot_rows: list[dict[str, Any]]
+    unchanged_records: list[SourceRecordInput]
+    alert_rows: list[dict[str, Any]]
+    new_count: int
+    changed_count: int
+
+
+# Counters are bumped while a batch is dispatched, so this one stays mutable.
+@dataclass(slots=True)
 class OutboxDispatchResult:
     picked: int = 0
     processed: int = 0
@@ -118,6 +188,67 @@ class NoopStorage:
         return None
 
 
+# A gateway or PostgREST may answer any of these after a write has already landed, so
+# only idempotent requests are replayed.
+_RETRY_STATUSES = frozenset({429, 502, 503, 504})
+_IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "PUT", "PATCH", "DELETE"})
+# Upper bound for a server-provided Retry-After on 429/503.
+_RETRY_AFTER_MAX_SECONDS = 30.0
+# Unique index columns backing on_conflict for each outbox table.
+_NOTIFICATION_OUTBOX_CONFLICT = "source_type,source_id,template_code,recipient"
+
+
+class _RetryTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport: httpx.AsyncBaseTransport, *, max_retries: int) -> None:
+        self._transport = transport
+        self._max_retries = max_retries
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        attempt = 0
+        while True:
+            response = await self._transport.handle_async_request(request)
+            if attempt >= self._max_retries or not _is_retryable(request, response.status_code):
+                return response
+            await response.aclose()
+            attempt += 1
+            # Exponential backoff with full jitter so parallel chunk writers do not retry in lockstep.
+            delay = random.uniform(0.1, 0.5) * 2**attempt
+            retry_after = _retry_after_seconds(response)
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, _RETRY_AFTER_MAX_SECONDS))
+            await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def _is_retryable(request: httpx.Request, status_code: int) -> bool:
+    if status_code not in _RETRY_STATUSES:
+        return False
+    if request.method in _IDEMPOTENT_METHODS:
+        return True
+    # POST upserts (merge- or ignore-duplicates) converge to the same rows when replayed.
+    return "resolution=" in request.headers.get("Prefer", "")
+
+
+def _retry_after_seconds(response: httpx.Response) -> float | None:
+    if response.status_code not in (429, 503):
+        return None
+    raw = response.headers.get("Retry-After")
+    if not raw:
+        return None
+    raw = raw.strip()
+    if raw.isdigit():
+        return float(raw)
+    try:
+        retry_at = parsedate_to_datetime(raw)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=UTC)
+    return max(0.0, (retry_at - datetime.now(UTC)).total_seconds())
+
+
 class SupabaseStorage:
     def __init__(self, settings: Settings) -> None:
         if not settings.supabase_url or not settings.supabase_service_role_key:
@@ -125,30 +256,84 @@ class SupabaseStorage:
         base_url = f"{settings.supabase_url.rstrip('/')}/rest/v1"
         timeout = httpx.Timeout(settings.supabase_request_timeout_ms / 1000)
         key = settings.supabase_service_role_key
+        limits = httpx.Limits(
+            max_connections=settings.http_pool_max_connections,
+            max_keepalive_connections=settings.http_pool_max_keepalive,
+            keepalive_expiry=60,
+        )
+        # With an explicit transport, pool limits and http2 belong on the inner transport.
+        transport = _RetryTransport(
+            httpx.AsyncHTTPTransport(limits=limits, http2=True),
+            max_retries=max(0, settings.supabase_max_retries),
+        )
         self._client = httpx.AsyncClient(
             base_url=base_url,
             timeout=timeout,
+            transport=transport,
             headers={
                 "apikey": key,
                 "Authorization": f"Bearer {key}",
                 "Content-Type": "application/json",
             },
         )
+        self._write_semaphore = asyncio.Semaphore(max(1, settings.supabase_write_concurrency))
+        self._gzip_requests = settings.supabase_gzip_requests
+        self._persist_batch_rpc_available = True
+        self._source_batch_rpc_available = True
+        self._job_lock_rpc_available = True
+        self._hash_diff_rpc_available = True
+        self._outbox_unique_keys_available = True
         self._alert_cooldown_minutes = max(0, settings.alert_cooldown_minutes)
+        # (source_type, source_id, alert_type) -> epoch seconds until which new alerts are suppressed.
+        self._cooldown_until: dict[tuple[str, str, str], float] = {}
         self._lock_owner = f"worker-{uuid4()}"
+        self._lock_owner_q = _encode_eq_value(self._lock_owner)
         self._sheet_dispatch_batch_size = max(1, settings.sheet_dispatch_batch_size)
         self._noti_dispatch_batch_size = max(1, settings.noti_dispatch_batch_size)
+        self._outbox_dispatch_concurrency = max(1, settings.outbox_dispatch_concurrency)
         self._outbox_retry_base_seconds = max(1, settings.outbox_retry_base_seconds)
         self._outbox_retry_max_seconds = max(self._outbox_retry_base_seconds, settings.outbox_retry_max_seconds)
         self._sheet_webhook_url = settings.sheet_webhook_url
         self._kakao_webhook_url = settings.kakao_webhook_url
         self._kakao_template_code = settings.kakao_template_code
         self._kakao_default_recipient = settings.kakao_default_recipient
-        self._dispatch_http = httpx.AsyncClient(timeout=timeout)
+        # Fixed part of every sheet-alert notification_outbox lookup.
+        self._sheet_alert_notification_filter = (
+            "source_type=eq.sheet_alert&"
+            f"template_code=eq.{_encode_eq_value(self._kakao_template_code)}&"
+            f"recipient=eq.{_encode_eq_value(self._kakao_default_recipient)}"
+        )
+        # Transport-level retries only cover failed connection attempts, so a webhook
+        # delivery is never sent twice by them.
+        self._dispatch_http = httpx.AsyncClient(
+            timeout=timeout,
+            transport=httpx.AsyncHTTPTransport(limits=limits, http2=True, retries=2),
+        )
 
     async def acquire_job_lock(self, job_name: str, ttl_seconds: int) -> bool:
-        now = _utc_now()
-        expires = _utc_after(seconds=max(1, ttl_seconds))
+        if self._job_lock_rpc_available:
+            acquired = await self._acquire_job_lock_rpc(job_name, ttl_seconds)
+            if acquired is not None:
+                return acquired
+            # Migration not applied yet: use the insert/takeover/refresh sequence from now on.
+            self._job_lock_rpc_available = False
+        return await self._acquire_job_lock_rest(job_name, ttl_seconds)
+
+    async def _acquire_job_lock_rpc(self, job_name: str, ttl_seconds: int) -> bool | None:
+        response = await self._post_json(
+            "/rpc/fn_acquire_job_lock",
+            {"p_job_name": job_name, "p_locked_by": self._lock_owner, "p_ttl_seconds": max(1, ttl_seconds)},
+        )
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return _response_json(response) is True
+
+    async def _acquire_job_lock_rest(self, job_name: str, ttl_seconds: int) -> bool:
+        now_dt = datetime.now(UTC)
+        now = now_dt.isoformat()
+        expires = (now_dt + timedelta(seconds=max(1, ttl_seconds))).isoformat()
+        job_name_q = _encode_eq_value(job_name)
         payload = {
             "job_name": job_name,
             "locked_by": self._lock_owner,
@@ -157,7 +342,7 @@ class SupabaseStorage:
         }
 
         # 1) try fresh insert
-        insert_response = await self._client.post("/job_lock", json=payload, headers={"Prefer": "return=minimal"})
+        insert_response = await self._post_json("/job_lock", payload, headers=_RETURN_MINIMAL_HEADERS)
         if insert_response.is_success:
             return True
         if insert_response.status_code not in {409}:
@@ -166,43 +351,43 @@ class SupabaseStorage:
         # 2) if existing lock is expired, take over
         takeover_query = (
             f"/job_lock?"
-            f"job_name=eq.{_encode_eq_value(job_name)}&"
+            f"job_name=eq.{job_name_q}&"
             f"lock_expires_at=lt.{_encode_eq_value(now)}&"
             "select=job_name"
         )
-        takeover_response = await self._client.patch(
+        takeover_response = await self._patch_json(
             takeover_query,
-            json={"locked_by": self._lock_owner, "locked_at": now, "lock_expires_at": expires},
-            headers={"Prefer": "return=representation"},
+            {"locked_by": self._lock_owner, "locked_at": now, "lock_expires_at": expires},
+            headers=_RETURN_REPRESENTATION_HEADERS,
         )
         takeover_response.raise_for_status()
-        takeover_rows = takeover_response.json()
+        takeover_rows = _response_json(takeover_response)
         if isinstance(takeover_rows, list) and takeover_rows:
             return True
 
         # 3) if already owned by this worker, just refresh ttl
         refresh_query = (
             f"/job_lock?"
-            f"job_name=eq.{_encode_eq_value(job_name)}&"
-            f"locked_by=eq.{_encode_eq_value(self._lock_owner)}&"
+            f"job_name=eq.{job_name_q}&"
+            f"locked_by=eq.{self._lock_owner_q}&"
             "select=job_name"
         )
-        refresh_response = await self._client.patch(
+        refresh_response = await self._patch_json(
             refresh_query,
-            json={"locked_at": now, "lock_expires_at": expires},
-            headers={"Prefer": "return=representation"},
+            {"locked_at": now, "lock_expires_at": expires},
+            headers=_RETURN_REPRESENTATION_HEADERS,
         )
         refresh_response.raise_for_status()
-        refresh_rows = refresh_response.json()
+        refresh_rows = _response_json(refresh_response)
         return isinstance(refresh_rows, list) and bool(refresh_rows)
 
     async def release_job_lock(self, job_name: str) -> None:
         query = (
             f"/job_lock?"
             f"job_name=eq.{_encode_eq_value(job_name)}&"
-            f"locked_by=eq.{_encode_eq_value(self._lock_owner)}"
+            f"locked_by=eq.{self._lock_owner_q}"
         )
-        response = await self._client.delete(query, headers={"Prefer": "return=minimal"})
+        response = await self._client.delete(query, headers=_RETURN_MINIMAL_HEADERS)
         response.raise_for_status()
 
     async def start_run(self, job_name: str, trigger_type: str) -> int | None:
@@ -210,11 +395,14 @@ class SupabaseStorage:
             "job_name": job_name,
             "trigger_type": trigger_type,
             "status": "RUNNING",
-            "started_at": _utc_now(),
         }
-        response = await self._client.post("/run_log?select=id", json=payload, headers={"Prefer": "return=representation"})
+        response = await self._client.post(
+            "/run_log?select=id",
+            content=orjson.dumps(payload),
+            headers=_RETURN_REPRESENTATION_HEADERS,
+        )
         response.raise_for_status()
-        rows = response.json()
+        rows = _response_json(response)
         if isinstance(rows, list) and rows:
             run_id = rows[0].get("id")
             if isinstance(run_id, int):
@@ -242,6 +430,7 @@ class SupabaseStorage:
             filtered = await self._filter_alert_rows_by_cooldown([failure_alert])
             if filtered:
                 await self._insert_alerts(filtered)
+                self._remember_alert_cooldown(filtered)
                 failure_alert_count = len(filtered)
 
         if run_id is None:
@@ -258,7 +447,7 @@ class SupabaseStorage:
         }
         if error_message:
             payload["error_message"] = error_message[:1500]
-        response = await self._client.patch(f"/run_log?id=eq.{run_id}", json=payload)
+        response = await self._send_discarding_body("PATCH", f"/run_log?id=eq.{run_id}", content=orjson.dumps(payload))
         response.raise_for_status()
 
     async def upsert_source_records(self, records: list[SourceRecordInput]) -> PersistResult:
@@ -266,55 +455,31 @@ class SupabaseStorage:
             return PersistResult(upserted_count=0, new_count=0, changed_count=0, alert_count=0)
 
         existing_hashes = await self._fetch_existing_hashes(records)
-        diff = self._build_diff(records, existing_hashes)
-        alert_rows = self._build_alert_rows(records, diff)
-        alert_rows = await self._filter_alert_rows_by_cooldown(alert_rows)
-        now = _utc_now()
-        source_rows: list[dict[str, Any]] = []
-        snapshot_rows: list[dict[str, Any]] = []
-        for record in records:
-            source_rows.append(
-                {
-                    "source_type": record.source_type,
-                    "source_id": record.source_id,
-                    "category_id": record.category_id,
-                    "course_id": record.course_id,
-                    "term_id": record.term_id,
-                    "user_id": record.user_id,
-                    "user_name": record.user_name,
-                    "company_name": record.company_name,
-                    "dept_name": record.dept_name,
-                    "job_position": record.job_position,
-                    "status": record.status,
-                    "status_msg": record.status_msg,
-                    "code_name": record.code_name,
-                    "ds_date": record.ds_date,
-                    "gc_date": record.gc_date,
-                    "sjc_date": record.sjc_date,
-                    "update_time": record.update_time,
-                    "payload": record.payload,
-                    "payload_hash": record.payload_hash,
-                    "last_seen_at": now,
-                }
+        now = _utc_now_millis()
+        if len(records) >= _OFFLOAD_MIN_RECORDS:
+            # Large batches build their rows off the event loop so in-flight requests
+            # (other chunks, outbox dispatch) keep being serviced meanwhile.
+            batch = await asyncio.to_thread(self._prepare_write_batch, records, existing_hashes, now)
+        else:
+            batch = self._prepare_write_batch(records, existing_hashes, now)
+        alert_rows = await self._filter_alert_rows_by_cooldown(batch.alert_rows)
+
+        writes = []
+        if batch.source_rows:
+            writes.append(
+                self._write_source_rows(batch.source_rows, batch.snapshot_rows, alert_rows)
             )
-            snapshot_rows.append(
-                {
-                    "source_type": record.source_type,
-                    "source_id": record.source_id,
-                    "snapshot_hash": record.payload_hash,
-                    "payload": record.payload,
-                }
-            )
-
-        await self._upsert_source_rows(source_rows)
-        await self._insert_snapshots(snapshot_rows)
-        if alert_rows:
-            await self._insert_alerts(alert_rows)
-        business_diff_counts = self._count_business_diff(records, diff)
+        elif alert_rows:
+            # Alerts only depend on the diff computed above, not on the source writes landing first.
+            writes.append(self._insert_alerts(alert_rows))
+        if batch.unchanged_records:
+            writes.append(self._touch_last_seen(batch.unchanged_records, now))
+        await asyncio.gather(*writes)
+        self._remember_alert_cooldown(alert_rows)
         return PersistResult(
             upserted_count=len(records),
-            new_count=business_diff_counts["NEW"],
-            changed_count=business_diff_counts["CHANGED"],
+            new_count=batch.new_count,
+            changed_count=batch.changed_count,
             alert_count=len(alert_rows),
         )
 
@@ -322,93 +487,174 @@ class SupabaseStorage:
         limit = max(1, batch_size or self._sheet_dispatch_batch_size)
         rows = await self._fetch_sheet_outbox_candidates(limit)
         result = OutboxDispatchResult(picked=len(rows))
+        claimed_ids = await self._claim_outbox_rows("sheet_outbox", rows)
+        semaphore = asyncio.Semaphore(self._outbox_dispatch_concurrency)
+        delivered: list[tuple[int, dict[str, Any]]] = []
+        failures: list[tuple[int, int, str]] = []
+
+        async def process(row: dict[str, Any], row_id: int) -> None:
+            async with semaphore:
+                try:
+                    payload = row.get("payload")
+                    if not isinstance(payload, dict):
+                        payload = {}
+                    await self._deliver_sheet_payload(payload)
+                    delivered.append((row_id, row))
+                except Exception as exc:
+                    failures.append((row_id, _to_int(row.get("retry_count")) or 0, str(exc)))
+                    result.failed += 1
+
+        tasks = []
         for row in rows:
             row_id = _to_int(row.get("id"))
-            status = _to_str(row.get("status"))
-            if row_id is None or not status:
-                result.skipped += 1
-                continue
-            claimed = await self._claim_outbox_row("sheet_outbox", row_id=row_id, current_status=status)
-            if not claimed:
+            if row_id is None or row_id not in claimed_ids:
                 result.skipped += 1
                 continue
             result.processed += 1
+            tasks.append(process(row, row_id))
+        await asyncio.gather(*tasks)
+        sent_ids: list[int] = []
+        if delivered:
+            # Notifications for the whole batch are enqueued together. If that insert fails,
+            # enqueue row by row so one bad insert does not send every delivered row back to
+            # the sheet; only a row whose own notification cannot be queued is retried.
             try:
-                payload = row.get("payload")
-                if not isinstance(payload, dict):
-                    payload = {}
-                await self._deliver_sheet_payload(payload)
-                enqueued = await self._enqueue_notification_from_sheet(row)
-                if enqueued:
-                    result.notification_enqueued += 1
-                await self._mark_outbox_sent("sheet_outbox", row_id=row_id)
-                result.sent += 1
-            except Exception as exc:
-                await self._mark_outbox_failed(
-                    "sheet_outbox",
-                    row_id=row_id,
-                    current_retry_count=_to_int(row.get("retry_count")) or 0,
-                    error_message=str(exc),
+                result.notification_enqueued += await self._enqueue_notifications_from_sheet(
+                    [row for _, row in delivered]
+                )
+                sent_ids = [row_id for row_id, _ in delivered]
+            except Exception:
+                enqueued = await asyncio.gather(
+                    *(self._enqueue_notifications_from_sheet([row]) for _, row in delivered),
+                    return_exceptions=True,
                 )
-                result.failed += 1
+                for (row_id, row), outcome in zip(delivered, enqueued):
+                    if isinstance(outcome, Exception):
+                        failures.append((row_id, _to_int(row.get("retry_count")) or 0, str(outcome)))
+                        result.failed += 1
+                    else:
+                        sent_ids.append(row_id)
+                        result.notification_enqueued += outcome
+            result.sent += len(sent_ids)
+        await self._mark_outbox_results("sheet_outbox", sent_ids, failures)
         return result
 
     async def dispatch_notification_outbox(self, batch_size: int | None = None) -> OutboxDispatchResult:
         limit = max(1, batch_size or self._noti_dispatch_batch_size)
         rows = await self._fetch_notification_outbox_candidates(limit)
         result = OutboxDispatchResult(picked=len(rows))
+        claimed_ids = await self._claim_outbox_rows("notification_outbox", rows)
+        semaphore = asyncio.Semaphore(self._outbox_dispatch_concurrency)
+        sent_ids: list[int] = []
+        failures: list[tuple[int, int, str]] = []
+
+        async def process(row: dict[str, Any], row_id: int) -> None:
+            async with semaphore:
+                try:
+                    payload = row.get("payload")
+                    if not isinstance(payload, dict):
+                        payload = {}
+                    await self._deliver_notification_payload(
+                        channel=_to_str(row.get("channel")) or "KAKAO_ALIMTALK",
+                        template_code=_to_str(row.get("template_code")) or self._kakao_template_code,
+                        recipient=_to_str(row.get("recipient")) or self._kakao_default_recipient,
+                        payload=payload,
+                    )
+                    sent_ids.append(row_id)
+                    result.sent += 1
+                except Exception as exc:
+                    failures.append((row_id, _to_int(row.get("retry_count")) or 0, str(exc)))
+                    result.failed += 1
+
+        tasks = []
         for row in rows:
             row_id = _to_int(row.get("id"))
-            status = _to_str(row.get("status"))
-            if row_id is None or not status:
-                result.skipped += 1
-                continue
-            claimed = await self._claim_outbox_row("notification_outbox", row_id=row_id, current_status=status)
-            if not claimed:
+            if row_id is None or row_id not in claimed_ids:
                 result.skipped += 1
                 continue
             result.processed += 1
-            try:
-                payload = row.get("payload")
-                if not isinstance(payload, dict):
-                    payload = {}
-                await self._deliver_notification_payload(
-                    channel=_to_str(row.get("channel")) or "KAKAO_ALIMTALK",
-                    template_code=_to_str(row.get("template_code")) or self._kakao_template_code,
-                    recipient=_to_str(row.get("recipient")) or self._kakao_default_recipient,
-                    payload=payload,
-                )
-                await self._mark_outbox_sent("notification_outbox", row_id=row_id)
-                result.sent += 1
-            except Exception as exc:
-                await self._mark_outbox_failed(
-                    "notification_outbox",
-                    row_id=row_id,
-                    current_retry_count=_to_int(row.get("retry_count")) or 0,
-                    error_message=str(exc),
-                )
-                result.failed += 1
+            tasks.append(process(row, row_id))
+        await asyncio.gather(*tasks)
+        await self._mark_outbox_results("notification_outbox", sent_ids, failures)
         return result
 
     async def _fetch_existing_hashes(self, records: list[SourceRecordInput]) -> dict[tuple[str, str], str]:
         result: dict[tuple[str, str], str] = {}
+        if self._hash_diff_rpc_available:
+            if await self._diff_source_hashes_rpc(records, result):
+                return result
+            # Migration not applied yet: fetch stored hashes with GET from now on.
+            self._hash_diff_rpc_available = False
+        await self._fetch_stored_hashes(records, result)
+        return result
+
+    async def _diff_source_hashes_rpc(
+        self,
+        records: list[SourceRecordInput],
+        result: dict[tuple[str, str], str],
+    ) -> bool:
+        # The server returns only keys whose stored hash differs (null when absent), so
+        # unchanged records cost no response bytes. Rebuild the same existing-hash map:
+        # unchanged -> own hash, changed -> stored hash, new -> missing.
+        async def call_chunk(chunk: list[SourceRecordInput]) -> list[Any] | None:
+            body = orjson.dumps(
+                {
+                    "rows": [
+                        {
+                            "source_type": record.source_type,
+                            "source_id": record.source_id,
+                            "payload_hash": record.payload_hash,
+                        }
+                        for record in chunk
+                    ]
+                }
+            )
+            response = await self._client.post("/rpc/fn_diff_source_hashes", content=body)
+            if response.status_code == 404:
+                return None
+            response.raise_for_status()
+            rows = _response_json(response)
+            return rows if isinstance(rows, list) else []
+
+        chunk_results = await asyncio.gather(*(call_chunk(chunk) for chunk in _chunks(records, 2000)))
+        if any(rows is None for rows in chunk_results):
+            return False
+        for record in records:
+            result[(record.source_type, record.source_id)] = record.payload_hash
+        for rows in chunk_results:
+            for row in rows:
+                if not isinstance(row, dict):
+                    continue
+                key = (row.get("source_type"), row.get("source_id"))
+                stored_hash = row.get("payload_hash")
+                if isinstance(stored_hash, str):
+                    result[key] = stored_hash
+                else:
+                    result.pop(key, None)
+        return True
+
+    async def _fetch_stored_hashes(
+        self,
+        records: list[SourceRecordInput],
+        result: dict[tuple[str, str], str],
+    ) -> None:
         source_types = sorted({record.source_type for record in records})
         source_ids = sorted({record.source_id for record in records})
         if not source_types or not source_ids:
-            return result
+            return
 
         type_filter = _build_in_filter(source_types)
-        for id_chunk in _chunks_text(source_ids, 200):
+        for id_chunk in _chunks(source_ids, 200):
             id_filter = _build_in_filter(id_chunk)
             query = (
                 "/source_record"
                 f"?select=source_type,source_id,payload_hash"
-                f"&source_type=in.{quote(type_filter, safe='(),\"')}"
-                f"&source_id=in.{quote(id_filter, safe='(),\"@:._-')}"
+                f"&source_type=in.{type_filter}"
+                f"&source_id=in.{id_filter}"
             )
             response = await self._client.get(query)
             response.raise_for_status()
-            rows = response.json()
+            rows = _response_json(response)
             if not isinstance(rows, list):
                 continue
             for row in rows:
@@ -419,176 +665,347 @@ class SupabaseStorage:
                 payload_hash = row.get("payload_hash")
                 if isinstance(source_type, str) and isinstance(source_id, str) and isinstance(payload_hash, str):
                     result[(source_type, source_id)] = payload_hash
-        return result
 
-    def _build_diff(
+    def _prepare_write_batch(
         self,
         records: list[SourceRecordInput],
         existing_hashes: dict[tuple[str, str], str],
-    ) -> dict[tuple[str, str], str]:
-        diff: dict[tuple[str, str], str] = {}
+        now: str,
+    ) -> _WriteBatch:
+        # Single pass: diff, business counts, alert rows and write rows share one key per record.
+        # Writes keep the last occurrence of a key (as fn_upsert_source_and_snapshot does),
+        # since one upsert statement cannot touch the same row twice.
+        changed: dict[tuple[str, str], SourceRecordInput] = {}
+        unchanged: dict[tuple[str, str], SourceRecordInput] = {}
+        alert_rows: list[dict[str, Any]] = []
+        new_count = 0
+        changed_count = 0
         for record in records:
             key = (record.source_type, record.source_id)
             old_hash = existing_hashes.get(key)
-            if old_hash is None:
-                diff[key] = "NEW"
-            elif old_hash != record.payload_hash:
-                diff[key] = "CHANGED"
-        return diff
-
-    def _build_alert_rows(
-        self,
-        records: list[SourceRecordInput],
-        diff: dict[tuple[str, str], str],
-    ) -> list[dict[str, Any]]:
-        rows: list[dict[str, Any]] = []
-        for record in records:
+            if old_hash == record.payload_hash:
+                # Unchanged: only last_seen_at is bumped, no column rewrite or snapshot row.
+                changed.pop(key, None)
+                unchanged[key] = record
+                continue
+            unchanged.pop(key, None)
+            changed[key] = record
             # MVP: business-facing alerts only from enrolment status records.
             if record.source_type != "enrolment_status":
                 continue
-            key = (record.source_type, record.source_id)
-            alert_type = diff.get(key)
-            if alert_type not in {"NEW", "CHANGED"}:
-                continue
-            is_paid = _is_truthy_timestamp(record.gc_date)
-            is_doc_ready = _is_truthy_timestamp(record.sjc_date)
-            paid_label = "Y" if is_paid else "N"
-            doc_ready_label = "Y" if is_doc_ready else "N"
-            severity = _determine_severity(
-                alert_type=alert_type,
-                status=record.status,
-                is_paid=is_paid,
-                is_doc_ready=is_doc_ready,
-            )
-            rows.append(
-                {
-                    "source_type": record.source_type,
-                    "source_id": record.source_id,
-                    "alert_type": alert_type,
-                    "severity": severity,
-                    "title": f"{alert_type} enrolment status",
-                    "message": (
-                        f"{record.source_id} "
-                        f"status={record.status or '-'} "
-                        f"paid={paid_label} "
-                        f"doc_ready={doc_ready_label}"
-                    ),
-                    "detail": {
-                        "source_type": record.source_type,
-                        "source_id": record.source_id,
-                        "category_id": record.category_id,
-                        "course_id": record.course_id,
-                        "term_id": record.term_id,
-                        "user_id": record.user_id,
-                        "status": record.status,
-                        "status_msg": record.status_msg,
-                        "code_name": record.code_name,
-                        "is_paid": is_paid,
-                        "is_doc_ready": is_doc_ready,
-                        "gc_date": record.gc_date,
-                        "sjc_date": record.sjc_date,
-                        "update_time": record.update_time,
-                        "payload_hash": record.payload_hash,
-                    },
-                    "review_status": "AUTO",
-                    "resolved": False,
-                }
-            )
-        return rows
+            if old_hash is None:
+                alert_type = "NEW"
+                new_count += 1
+            else:
+                alert_type = "CHANGED"
+                changed_count += 1
+            alert_rows.append(self._build_alert_row(record, alert_type))
+
+        return _WriteBatch(
+            source_rows=[
+                dict(zip(_SOURCE_RECORD_COLUMNS, _source_record_values(record)), last_seen_at=now)
+                for record in changed.values()
+            ],
+            # Snapshot rows reference the same payload dict; nothing is copied.
+            snapshot_rows=[dict(zip(_SNAPSHOT_COLUMNS, _snapshot_values(record))) for record in changed.values()],
+            unchanged_records=list(unchanged.values()),
+            alert_rows=alert_rows,
+            new_count=new_count,
+            changed_count=changed_count,
+        )
 
-    def _count_business_diff(
+    def _build_alert_row(self, record: SourceRecordInput, alert_type: str) -> dict[str, Any]:
+        is_paid = _is_truthy_timestamp(record.gc_date)
+        is_doc_ready = _is_truthy_timestamp(record.sjc_date)
+        paid_label = "Y" if is_paid else "N"
+        doc_ready_label = "Y" if is_doc_ready else "N"
+        severity = _ALERT_SEVERITY[(alert_type, is_paid, is_doc_ready, record.status == "DS")]
+        return {
+            "source_type": record.source_type,
+            "source_id": record.source_id,
+            "alert_type": alert_type,
+            "severity": severity,
+            "title": f"{alert_type} enrolment status",
+            "message": (
+                f"{record.source_id} "
+                f"status={record.status or '-'} "
+                f"paid={paid_label} "
+                f"doc_ready={doc_ready_label}"
+            ),
+            "detail": {
+                "source_type": record.source_type,
+                "source_id": record.source_id,
+                "category_id": record.category_id,
+                "course_id": record.course_id,
+                "term_id": record.term_id,
+                "user_id": record.user_id,
+                "status": record.status,
+                "status_msg": record.status_msg,
+                "code_name": record.code_name,
+                "is_paid": is_paid,
+                "is_doc_ready": is_doc_ready,
+                "gc_date": record.gc_date,
+                "sjc_date": record.sjc_date,
+                "update_time": record.update_time,
+                "payload_hash": record.payload_hash,
+            },
+            "review_status": "AUTO",
+            "resolved": False,
+        }
+
+    async def _write_source_rows(
         self,
-        records: list[SourceRecordInput],
-        diff: dict[tuple[str, str], str],
-    ) -> dict[str, int]:
-        counts = {"NEW": 0, "CHANGED": 0}
+        source_rows: list[dict[str, Any]],
+        snapshot_rows: list[dict[str, Any]],
+        alert_rows: list[dict[str, Any]],
+    ) -> None:
+        if self._persist_batch_rpc_available:
+            if await self._persist_source_batch_rpc(source_rows, alert_rows):
+                return
+            # Migration not applied yet: write alerts separately from the source rows from now on.
+            self._persist_batch_rpc_available = False
+        writes = [self._write_source_and_snapshot(source_rows, snapshot_rows)]
+        if alert_rows:
+            writes.append(self._insert_alerts(alert_rows))
+        await asyncio.gather(*writes)
+
+    async def _write_source_and_snapshot(
+        self,
+        source_rows: list[dict[str, Any]],
+        snapshot_rows: list[dict[str, Any]],
+    ) -> None:
+        if self._source_batch_rpc_available:
+            if await self._upsert_source_and_snapshot_rpc(source_rows):
+                return
+            # Migration not applied yet: stay on the two-request path from now on.
+            self._source_batch_rpc_available = False
+        # Different tables, no ordering dependency between the two writes.
+        await asyncio.gather(
+            self._upsert_source_rows(source_rows),
+            self._insert_snapshots(snapshot_rows),
+        )
+
+    async def _persist_source_batch_rpc(
+        self,
+        source_rows: list[dict[str, Any]],
+        alert_rows: list[dict[str, Any]],
+    ) -> bool:
+        # Each chunk carries the alerts (and sheet_outbox rows) of its own records,
+        # so a chunk's business rows and outbox rows commit together.
+        alerts_by_key: dict[tuple[Any, Any], list[dict[str, Any]]] = {}
+        for alert_row in alert_rows:
+            key = (alert_row.get("source_type"), alert_row.get("source_id"))
+            alerts_by_key.setdefault(key, []).append(alert_row)
+        payloads: list[dict[str, Any]] = []
+        for chunk in _chunks(source_rows, 500):
+            chunk_alerts = [
+                alert_row
+                for row in chunk
+                for alert_row in alerts_by_key.pop((row["source_type"], row["source_id"]), ())
+            ]
+            payloads.append({"rows": chunk, "alerts": chunk_alerts})
+        if alerts_by_key and payloads:
+            payloads[0]["alerts"].extend(
+                alert_row for leftover in alerts_by_key.values() for alert_row in leftover
+            )
+        for payload in payloads:
+            payload["outbox"] = [
+                outbox_row
+                for outbox_row in map(_build_sheet_outbox_row, payload["alerts"])
+                if outbox_row is not None
+            ]
+
+        async def call_chunk(payload: dict[str, Any]) -> bool:
+            async with self._write_semaphore:
+                response = await self._send_discarding_body(
+                    "POST",
+                    "/rpc/fn_persist_source_batch",
+                    content=orjson.dumps(payload),
+                    headers=_RETURN_MINIMAL_HEADERS,
+                )
+                if response.status_code == 404:
+                    return False
+                response.raise_for_status()
+                return True
+
+        results = await asyncio.gather(*(call_chunk(payload) for payload in payloads))
+        return all(results)
+
+    async def _upsert_source_and_snapshot_rpc(self, rows: list[dict[str, Any]]) -> bool:
+        # One round trip and one transaction per chunk for source_record + snapshot.
+        async def call_chunk(chunk: list[dict[str, Any]]) -> bool:
+            async with self._write_semaphore:
+                response = await self._send_discarding_body(
+                    "POST",
+                    "/rpc/fn_upsert_source_and_snapshot",
+                    content=orjson.dumps({"rows": chunk}),
+                    headers=_RETURN_MINIMAL_HEADERS,
+                )
+                if response.status_code == 404:
+                    return False
+                response.raise_for_status()
+                return True
+
+        results = await asyncio.gather(*(call_chunk(chunk) for chunk in _chunks(rows, 500)))
+        return all(results)
+
+    async def _touch_last_seen(self, records: list[SourceRecordInput], last_seen_at: str) -> None:
+        ids_by_type: dict[str, list[str]] = {}
         for record in records:
-            if record.source_type != "enrolment_status":
-                continue
-            key = (record.source_type, record.source_id)
-            value = diff.get(key)
-            if value in counts:
-                counts[value] += 1
-        return counts
+            ids_by_type.setdefault(record.source_type, []).append(record.source_id)
+        body = orjson.dumps({"last_seen_at": last_seen_at})
 
-    async def _upsert_source_rows(self, rows: list[dict[str, Any]]) -> None:
-        for chunk in _chunks(rows, 500):
-            response = await self._client.post(
-                "/source_record?on_conflict=source_type,source_id",
-                json=chunk,
-                headers={"Prefer": "resolution=merge-duplicates,return=minimal"},
+        async def patch_chunk(source_type: str, id_chunk: list[str]) -> None:
+            id_filter = _build_in_filter(id_chunk)
+            query = (
+                "/source_record"
+                f"?source_type=eq.{_encode_eq_value(source_type)}"
+                f"&source_id=in.{id_filter}"
             )
-            response.raise_for_status()
+            async with self._write_semaphore:
+                response = await self._send_discarding_body(
+                    "PATCH", query, content=body, headers=_RETURN_MINIMAL_HEADERS
+                )
+                response.raise_for_status()
 
-    async def _insert_snapshots(self, rows: list[dict[str, Any]]) -> None:
-        for chunk in _chunks(rows, 500):
-            response = await self._client.post(
-                "/snapshot",
-                json=chunk,
-                headers={"Prefer": "return=minimal"},
+        await asyncio.gather(
+            *(
+                patch_chunk(source_type, id_chunk)
+                for source_type, source_ids in ids_by_type.items()
+                for id_chunk in _chunks(source_ids, 200)
             )
-            response.raise_for_status()
+        )
+
+    async def _upsert_source_rows(self, rows: list[dict[str, Any]]) -> None:
+        await self._post_chunks(
+            "/source_record?on_conflict=source_type,source_id",
+            rows,
+            headers=_UPSERT_HEADERS,
+        )
+
+    async def _insert_snapshots(self, rows: list[dict[str, Any]]) -> None:
+        await self._post_chunks("/snapshot", rows, headers=_RETURN_MINIMAL_HEADERS)
+
+    async def _post_chunks(self, path: str, rows: list[dict[str, Any]], *, headers: dict[str, str]) -> None:
+        async def post_chunk(chunk: list[dict[str, Any]]) -> None:
+            async with self._write_semaphore:
+                response = await self._send_discarding_body("POST", path, content=orjson.dumps(chunk), headers=headers)
+                response.raise_for_status()
+
+        await asyncio.gather(*(post_chunk(chunk) for chunk in _chunks(rows, 500)))
+
+    async def _post_json(
+        self,
+        url: str,
+        payload: Any,
+        *,
+        headers: dict[str, str] | None = None,
+    ) -> httpx.Response:
+        return await self._client.post(url, content=orjson.dumps(payload), headers=headers)
+
+    async def _patch_json(
+        self,
+        url: str,
+        payload: Any,
+        *,
+        headers: dict[str, str] | None = None,
+    ) -> httpx.Response:
+        return await self._client.patch(url, content=orjson.dumps(payload), headers=headers)
+
+    async def _send_discarding_body(
+        self,
+        method: str,
+        url: str,
+        *,
+        content: bytes,
+        headers: dict[str, str] | None = None,
+    ) -> httpx.Response:
+        if self._gzip_requests and len(content) >= _GZIP_MIN_BYTES:
+            # Bulk row JSON is highly repetitive; level 1 keeps the CPU cost low.
+            content = gzip.compress(content, compresslevel=1)
+            headers = {**headers, "Content-Encoding": "gzip"} if headers else _GZIP_HEADERS
+        # return=minimal writes have nothing worth reading; release the stream without
+        # buffering the body. Status and headers stay available for raise_for_status().
+        async with self._client.stream(method, url, content=content, headers=headers) as response:
+            return response
 
     async def _insert_alerts(self, rows: list[dict[str, Any]]) -> None:
-        for chunk in _chunks(rows, 500):
-            response = await self._client.post(
-                "/alert",
-                json=chunk,
-                headers={"Prefer": "return=minimal"},
-            )
+        if self._outbox_unique_keys_available:
+            await self._insert_alert_rows(rows)
+            if await self._enqueue_sheet_outbox_ignoring_duplicates(rows):
+                return
+            # Migration not applied yet: dedup with a row_key lookup from now on.
+            self._outbox_unique_keys_available = False
+            await self._enqueue_sheet_outbox(await self._new_sheet_outbox_rows(rows))
+            return
+        # The outbox dedup lookup overlaps the alert insert; the enqueue itself still waits
+        # for the alerts to land so a failed insert never leaves orphan outbox rows.
+        _, outbox_rows = await asyncio.gather(
+            self._insert_alert_rows(rows),
+            self._new_sheet_outbox_rows(rows),
+        )
+        await self._enqueue_sheet_outbox(outbox_rows)
+
+    async def _enqueue_sheet_outbox_ignoring_duplicates(self, alert_rows: list[dict[str, Any]]) -> bool:
+        # The unique row_key index skips rows already queued, in the same round trip.
+        outbox_rows = [
+            outbox_row
+            for outbox_row in map(_build_sheet_outbox_row, alert_rows)
+            if outbox_row is not None
+        ]
+
+        async def post_chunk(chunk: list[dict[str, Any]]) -> bool:
+            async with self._write_semaphore:
+                response = await self._post_json(
+                    "/sheet_outbox?on_conflict=row_key",
+                    chunk,
+                    headers=_IGNORE_DUPLICATES_HEADERS,
+                )
+            if _is_missing_conflict_target(response):
+                return False
             response.raise_for_status()
-        await self._enqueue_sheet_outbox(rows)
+            return True
 
-    async def _enqueue_sheet_outbox(self, alert_rows: list[dict[str, Any]]) -> None:
-        if not alert_rows:
-            return
-        outbox_rows: list[dict[str, Any]] = []
-        for row in alert_rows:
-            source_type = _to_str(row.get("source_type"))
-            source_id = _to_str(row.get("source_id"))
-            alert_type = _to_str(row.get("alert_type"))
-            if not source_type or not source_id or not alert_type:
-                continue
-            row_key = _build_alert_row_key(row)
-            if await self._sheet_outbox_row_exists(row_key):
-                continue
-            outbox_rows.append(
-                {
-                    "source_type": source_type,
-                    "source_id": source_id,
-                    "row_key": row_key,
-                    "payload": {
-                        "source_type": source_type,
-                        "source_id": source_id,
-                        "alert_type": alert_type,
-                        "severity": _to_str(row.get("severity")) or "medium",
-                        "title": _to_str(row.get("title")),
-                        "message": _to_str(row.get("message")),
-                        "detail": row.get("detail") if isinstance(row.get("detail"), dict) else {},
-                    },
-                }
-            )
+        results = await asyncio.gather(*(post_chunk(chunk) for chunk in _chunks(outbox_rows, 500)))
+        return all(results)
+
+    async def _insert_alert_rows(self, rows: list[dict[str, Any]]) -> None:
+        await self._post_chunks("/alert", rows, headers=_RETURN_MINIMAL_HEADERS)
+
+    async def _new_sheet_outbox_rows(self, alert_rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        candidates = [
+            outbox_row
+            for outbox_row in map(_build_sheet_outbox_row, alert_rows)
+            if outbox_row is not None
+        ]
+        if not candidates:
+            return []
+        existing_keys = await self._sheet_outbox_existing_keys(
+            [outbox_row["row_key"] for outbox_row in candidates]
+        )
+        return [outbox_row for outbox_row in candidates if outbox_row["row_key"] not in existing_keys]
+
+    async def _enqueue_sheet_outbox(self, outbox_rows: list[dict[str, Any]]) -> None:
         if not outbox_rows:
             return
-        for chunk in _chunks(outbox_rows, 500):
-            response = await self._client.post(
-                "/sheet_outbox",
-                json=chunk,
-                headers={"Prefer": "return=minimal"},
-            )
+        await self._post_chunks("/sheet_outbox", outbox_rows, headers=_RETURN_MINIMAL_HEADERS)
+
+    async def _sheet_outbox_existing_keys(self, row_keys: list[str]) -> set[str]:
+        # One GET per 200 keys instead of one per alert row.
+        async def fetch_chunk(key_chunk: list[str]) -> list[Any]:
+            query = f"/sheet_outbox?select=row_key&row_key=in.{_build_in_filter(key_chunk)}"
+            response = await self._client.get(query)
             response.raise_for_status()
+            rows = _response_json(response)
+            return rows if isinstance(rows, list) else []
 
-    async def _sheet_outbox_row_exists(self, row_key: str) -> bool:
-        query = (
-            "/sheet_outbox?"
-            "select=id&"
-            f"row_key=eq.{_encode_eq_value(row_key)}&"
-            "limit=1"
-        )
-        response = await self._client.get(query)
-        response.raise_for_status()
-        rows = response.json()
-        return isinstance(rows, list) and bool(rows)
+        results = await asyncio.gather(*(fetch_chunk(chunk) for chunk in _chunks(sorted(set(row_keys)), 200)))
+        existing: set[str] = set()
+        for rows in results:
+            for row in rows:
+                if isinstance(row, dict) and isinstance(row.get("row_key"), str):
+                    existing.add(row["row_key"])
+        return existing
 
     async def _fetch_sheet_outbox_candidates(self, batch_size: int) -> list[dict[str, Any]]:
         return await self._fetch_outbox_candidates(
@@ -614,39 +1031,26 @@ class SupabaseStorage:
         select_fields: str,
         batch_size: int,
     ) -> list[dict[str, Any]]:
-        rows: list[dict[str, Any]] = []
-        rows.extend(
-            await self._query_outbox_rows(
-                table_name=table_name,
-                select_fields=select_fields,
-                status="PENDING",
-                extra_filters="order=created_at.asc",
-                limit=batch_size,
-            )
+        now = _utc_now()
+        buckets = (
+            ("PENDING", "order=created_at.asc"),
+            ("FAILED", "next_retry_at=is.null&order=updated_at.asc"),
+            ("FAILED", f"next_retry_at=lte.{_encode_eq_value(now)}&order=next_retry_at.asc"),
         )
-        if len(rows) < batch_size:
-            remaining = batch_size - len(rows)
-            rows.extend(
-                await self._query_outbox_rows(
+        # Buckets are independent reads; fetch them together and keep their priority order.
+        results = await asyncio.gather(
+            *(
+                self._query_outbox_rows(
                     table_name=table_name,
                     select_fields=select_fields,
-                    status="FAILED",
-                    extra_filters="next_retry_at=is.null&order=updated_at.asc",
-                    limit=remaining,
-                )
-            )
-        if len(rows) < batch_size:
-            remaining = batch_size - len(rows)
-            now = _utc_now()
-            rows.extend(
-                await self._query_outbox_rows(
-                    table_name=table_name,
-                    select_fields=select_fields,
-                    status="FAILED",
-                    extra_filters=f"next_retry_at=lte.{_encode_eq_value(now)}&order=next_retry_at.asc",
-                    limit=remaining,
+                    status=status,
+                    extra_filters=extra_filters,
+                    limit=batch_size,
                 )
+                for status, extra_filters in buckets
             )
+        )
+        rows = [row for bucket_rows in results for row in bucket_rows]
         # Deduplicate by id, keeping the first order.
         deduped: list[dict[str, Any]] = []
         seen_ids: set[int] = set()
@@ -680,47 +1084,86 @@ class SupabaseStorage:
         )
         response = await self._client.get(query)
         response.raise_for_status()
-        rows = response.json()
+        rows = _response_json(response)
         if not isinstance(rows, list):
             return []
         return [row for row in rows if isinstance(row, dict)]
 
-    async def _claim_outbox_row(self, table_name: str, *, row_id: int, current_status: str) -> bool:
-        query = (
-            f"/{table_name}?"
-            f"id=eq.{row_id}&"
-            f"status=eq.{_encode_eq_value(current_status)}&"
-            "select=id"
-        )
-        response = await self._client.patch(
-            query,
-            json={
-                "status": "PROCESSING",
-                "last_attempt_at": _utc_now(),
-            },
-            headers={"Prefer": "return=representation"},
-        )
-        response.raise_for_status()
-        rows = response.json()
-        return isinstance(rows, list) and bool(rows)
+    async def _claim_outbox_rows(self, table_name: str, rows: list[dict[str, Any]]) -> set[int]:
+        # One compare-and-set PATCH per current status instead of one per row; only rows
+        # still in the status we read come back, so concurrent dispatchers never share a row.
+        ids_by_status: dict[str, list[int]] = {}
+        for row in rows:
+            row_id = _to_int(row.get("id"))
+            status = _to_str(row.get("status"))
+            if row_id is None or not status:
+                continue
+            ids_by_status.setdefault(status, []).append(row_id)
+        if not ids_by_status:
+            return set()
+        body = {"status": "PROCESSING", "last_attempt_at": _utc_now()}
 
-    async def _mark_outbox_sent(self, table_name: str, *, row_id: int) -> None:
-        response = await self._client.patch(
-            f"/{table_name}?id=eq.{row_id}",
-            json={
-                "status": "SENT",
-                "last_error": None,
-                "next_retry_at": None,
-                "last_attempt_at": _utc_now(),
-            },
-        )
-        response.raise_for_status()
+        async def claim(status: str, ids: list[int]) -> list[Any]:
+            query = (
+                f"/{table_name}?"
+                f"id=in.({','.join(map(str, ids))})&"
+                f"status=eq.{_encode_eq_value(status)}&"
+                "select=id"
+            )
+            response = await self._patch_json(query, body, headers=_RETURN_REPRESENTATION_HEADERS)
+            response.raise_for_status()
+            claimed_rows = _response_json(response)
+            return claimed_rows if isinstance(claimed_rows, list) else []
+
+        results = await asyncio.gather(*(claim(status, ids) for status, ids in ids_by_status.items()))
+        claimed: set[int] = set()
+        for claimed_rows in results:
+            for claimed_row in claimed_rows:
+                if isinstance(claimed_row, dict):
+                    row_id = _to_int(claimed_row.get("id"))
+                    if row_id is not None:
+                        claimed.add(row_id)
+        return claimed
+
+    async def _mark_outbox_results(
+        self,
+        table_name: str,
+        sent_ids: list[int],
+        failures: list[tuple[int, int, str]],
+    ) -> None:
+        # One PATCH for all sent rows and one per (retry_count, error) group for failed rows,
+        # instead of one per row. Rows in a failed group share the same backoff and message.
+        failed_groups: dict[tuple[int, str], list[int]] = {}
+        for row_id, retry_count, error_message in failures:
+            failed_groups.setdefault((retry_count, error_message[:1000]), []).append(row_id)
+        marks = []
+        if sent_ids:
+            marks.append(self._mark_outbox_sent(table_name, row_ids=sent_ids))
+        for (retry_count, error_message), row_ids in failed_groups.items():
+            marks.append(
+                self._mark_outbox_failed(
+                    table_name,
+                    row_ids=row_ids,
+                    current_retry_count=retry_count,
+                    error_message=error_message,
+                )
+            )
+        await asyncio.gather(*marks)
+
+    async def _mark_outbox_sent(self, table_name: str, *, row_ids: list[int]) -> None:
+        body = {
+            "status": "SENT",
+            "last_error": None,
+            "next_retry_at": None,
+            "last_attempt_at": _utc_now(),
+        }
+        await self._patch_outbox_ids(table_name, row_ids, body)
 
     async def _mark_outbox_failed(
         self,
         table_name: str,
         *,
-        row_id: int,
+        row_ids: list[int],
         current_retry_count: int,
         error_message: str,
     ) -> None:
@@ -729,22 +1172,52 @@ class SupabaseStorage:
             self._outbox_retry_base_seconds * (2 ** max(0, current_retry_count)),
             self._outbox_retry_max_seconds,
         )
-        response = await self._client.patch(
-            f"/{table_name}?id=eq.{row_id}",
-            json={
-                "status": "FAILED",
-                "retry_count": next_retry_count,
-                "last_error": error_message[:1000],
-                "last_attempt_at": _utc_now(),
-                "next_retry_at": _utc_after(seconds=delay_seconds),
-            },
-        )
-        response.raise_for_status()
+        body = {
+            "status": "FAILED",
+            "retry_count": next_retry_count,
+            "last_error": error_message[:1000],
+            "last_attempt_at": _utc_now(),
+            "next_retry_at": _utc_after(seconds=delay_seconds),
+        }
+        await self._patch_outbox_ids(table_name, row_ids, body)
+
+    async def _patch_outbox_ids(self, table_name: str, row_ids: list[int], body: dict[str, Any]) -> None:
+        content = orjson.dumps(body)
+        for id_chunk in _chunks(row_ids, 200):
+            try:
+                response = await self._send_discarding_body(
+                    "PATCH",
+                    f"/{table_name}?id=in.({','.join(map(str, id_chunk))})",
+                    content=content,
+                    headers=_RETURN_MINIMAL_HEADERS,
+                )
+                response.raise_for_status()
+            except httpx.HTTPError:
+                # Claimed rows that are never marked stay PROCESSING, which no selector picks
+                # up again; fall back to one PATCH per row for this chunk only.
+                await self._patch_outbox_rows(table_name, id_chunk, content)
+
+    async def _patch_outbox_rows(self, table_name: str, row_ids: list[int], content: bytes) -> None:
+        for row_id in row_ids:
+            try:
+                response = await self._send_discarding_body(
+                    "PATCH",
+                    f"/{table_name}?id=eq.{row_id}",
+                    content=content,
+                    headers=_RETURN_MINIMAL_HEADERS,
+                )
+                response.raise_for_status()
+            except httpx.HTTPError:
+                logger.exception("Failed to mark %s row %s; it stays PROCESSING.", table_name, row_id)
 
     async def _deliver_sheet_payload(self, payload: dict[str, Any]) -> None:
         if not self._sheet_webhook_url:
             return
-        response = await self._dispatch_http.post(self._sheet_webhook_url, json=payload)
+        response = await self._dispatch_http.post(
+            self._sheet_webhook_url,
+            content=orjson.dumps(payload),
+            headers=_JSON_CONTENT_HEADERS,
+        )
         response.raise_for_status()
 
     async def _deliver_notification_payload(
@@ -763,21 +1236,23 @@ class SupabaseStorage:
             "recipient": recipient,
             "payload": payload,
         }
-        response = await self._dispatch_http.post(self._kakao_webhook_url, json=body)
+        response = await self._dispatch_http.post(
+            self._kakao_webhook_url,
+            content=orjson.dumps(body),
+            headers=_JSON_CONTENT_HEADERS,
+        )
         response.raise_for_status()
 
-    async def _enqueue_notification_from_sheet(self, sheet_row: dict[str, Any]) -> bool:
-        row_key = _to_str(sheet_row.get("row_key"))
-        if not row_key:
-            return False
-        if await self._notification_outbox_exists(row_key):
-            return False
-        payload = sheet_row.get("payload")
-        if not isinstance(payload, dict):
-            payload = {}
-        response = await self._client.post(
-            "/notification_outbox",
-            json={
+    async def _enqueue_notifications_from_sheet(self, sheet_rows: list[dict[str, Any]]) -> int:
+        bodies: dict[str, dict[str, Any]] = {}
+        for sheet_row in sheet_rows:
+            row_key = _to_str(sheet_row.get("row_key"))
+            if not row_key or row_key in bodies:
+                continue
+            payload = sheet_row.get("payload")
+            if not isinstance(payload, dict):
+                payload = {}
+            bodies[row_key] = {
                 "source_type": "sheet_alert",
                 "source_id": row_key,
                 "channel": "KAKAO_ALIMTALK",
@@ -790,69 +1265,141 @@ class SupabaseStorage:
                     "source_id": _to_str(sheet_row.get("source_id")),
                     "alert": payload,
                 },
-            },
-            headers={"Prefer": "return=minimal"},
-        )
+            }
+        if not bodies:
+            return 0
+        if self._outbox_unique_keys_available:
+            # Only newly inserted rows come back, so the response length is the enqueued count.
+            response = await self._post_json(
+                f"/notification_outbox?on_conflict={_NOTIFICATION_OUTBOX_CONFLICT}&select=id",
+                list(bodies.values()),
+                headers=_IGNORE_DUPLICATES_REPRESENTATION_HEADERS,
+            )
+            if not _is_missing_conflict_target(response):
+                response.raise_for_status()
+                rows = _response_json(response)
+                return len(rows) if isinstance(rows, list) else 0
+            # Migration not applied yet: look up existing rows first from now on.
+            self._outbox_unique_keys_available = False
+        existing_ids = await self._notification_outbox_existing_ids(list(bodies))
+        new_bodies = [body for row_key, body in bodies.items() if row_key not in existing_ids]
+        if not new_bodies:
+            return 0
+        response = await self._post_json("/notification_outbox", new_bodies, headers=_RETURN_MINIMAL_HEADERS)
         response.raise_for_status()
-        return True
+        return len(new_bodies)
 
-    async def _notification_outbox_exists(self, row_key: str) -> bool:
-        query = (
+    async def _notification_outbox_existing_ids(self, row_keys: list[str]) -> set[str]:
+        # One GET per 200 keys instead of one per sheet row.
+        base_query = (
             "/notification_outbox?"
-            "select=id&"
-            "source_type=eq.sheet_alert&"
-            f"source_id=eq.{_encode_eq_value(row_key)}&"
-            f"template_code=eq.{_encode_eq_value(self._kakao_template_code)}&"
-            f"recipient=eq.{_encode_eq_value(self._kakao_default_recipient)}&"
-            "limit=1"
+            "select=source_id&"
+            f"{self._sheet_alert_notification_filter}&"
+            "source_id=in."
         )
-        response = await self._client.get(query)
-        response.raise_for_status()
-        rows = response.json()
-        return isinstance(rows, list) and bool(rows)
+
+        async def fetch_chunk(key_chunk: list[str]) -> list[Any]:
+            response = await self._client.get(base_query + _build_in_filter(key_chunk))
+            response.raise_for_status()
+            rows = _response_json(response)
+            return rows if isinstance(rows, list) else []
+
+        results = await asyncio.gather(*(fetch_chunk(chunk) for chunk in _chunks(row_keys, 200)))
+        return {
+            row["source_id"]
+            for rows in results
+            for row in rows
+            if isinstance(row, dict) and isinstance(row.get("source_id"), str)
+        }
 
     async def _filter_alert_rows_by_cooldown(self, rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
         if self._alert_cooldown_minutes <= 0 or not rows:
             return rows
         since = _utc_after(minutes=-self._alert_cooldown_minutes)
-        filtered: list[dict[str, Any]] = []
+        keyed_rows: list[tuple[tuple[str, str, str], dict[str, Any]]] = []
         for row in rows:
             source_type = row.get("source_type")
             source_id = row.get("source_id")
             alert_type = row.get("alert_type")
             if not isinstance(source_type, str) or not isinstance(source_id, str) or not isinstance(alert_type, str):
                 continue
-            exists = await self._has_recent_alert(
-                source_type=source_type,
-                source_id=source_id,
-                alert_type=alert_type,
-                since=since,
-            )
-            if not exists:
-                filtered.append(row)
-        return filtered
+            keyed_rows.append(((source_type, source_id, alert_type), row))
+        if not keyed_rows:
+            return []
+        now = time.time()
+        cooldown_until = self._cooldown_until
+        if len(cooldown_until) > _COOLDOWN_CACHE_MAX_ENTRIES:
+            self._cooldown_until = cooldown_until = {
+                key: until for key, until in cooldown_until.items() if until > now
+            }
+        # Keys known to be inside their window are suppressed without a round trip.
+        misses = {key for key, _ in keyed_rows if cooldown_until.get(key, 0.0) <= now}
+        recent = await self._fetch_recent_alert_keys(misses, since=since) if misses else {}
+        cooldown_seconds = self._alert_cooldown_minutes * 60
+        for key, created_at in recent.items():
+            cooldown_until[key] = created_at + cooldown_seconds
+        return [row for key, row in keyed_rows if key in misses and key not in recent]
+
+    async def _has_alerts_since(self, since_q: str) -> bool:
+        response = await self._client.get(f"/alert?select=id&created_at=gte.{since_q}&limit=1")
+        response.raise_for_status()
+        rows = _response_json(response)
+        return isinstance(rows, list) and bool(rows)
+
+    def _remember_alert_cooldown(self, rows: list[dict[str, Any]]) -> None:
+        if self._alert_cooldown_minutes <= 0 or not rows:
+            return
+        until = time.time() + self._alert_cooldown_minutes * 60
+        for row in rows:
+            key = (row.get("source_type"), row.get("source_id"), row.get("alert_type"))
+            if all(isinstance(part, str) for part in key):
+                self._cooldown_until[key] = until
 
-    async def _has_recent_alert(
+    async def _fetch_recent_alert_keys(
         self,
-        source_type: str,
-        source_id: str,
-        alert_type: str,
+        keys: set[tuple[str, str, str]],
         since: str,
-    ) -> bool:
-        query = (
-            "/alert?"
-            "select=id&"
-            f"source_type=eq.{_encode_eq_value(source_type)}&"
-            f"source_id=eq.{_encode_eq_value(source_id)}&"
-            f"alert_type=eq.{_encode_eq_value(alert_type)}&"
-            f"created_at=gte.{_encode_eq_value(since)}&"
-            "order=created_at.desc&"
-            "limit=1"
+    ) -> dict[tuple[str, str, str], float]:
+        since_q = _encode_eq_value(since)
+        if len(keys) > _COOLDOWN_KEYS_PER_QUERY and not await self._has_alerts_since(since_q):
+            # Nothing alerted in the window at all: skip the chunked lookups.
+            return {}
+
+        # One GET per ~100 keys instead of one per alert row. The in.() filters select a
+        # superset (cross product of the columns); exact triples are matched in memory.
+        async def fetch_chunk(key_chunk: list[tuple[str, str, str]]) -> list[Any]:
+            type_filter = _build_in_filter(sorted({key[0] for key in key_chunk}))
+            id_filter = _build_in_filter(sorted({key[1] for key in key_chunk}))
+            alert_type_filter = _build_in_filter(sorted({key[2] for key in key_chunk}))
+            query = (
+                "/alert"
+                "?select=source_type,source_id,alert_type,created_at"
+                f"&source_type=in.{type_filter}"
+                f"&source_id=in.{id_filter}"
+                f"&alert_type=in.{alert_type_filter}"
+                f"&created_at=gte.{since_q}"
+            )
+            response = await self._client.get(query)
+            response.raise_for_status()
+            rows = _response_json(response)
+            return rows if isinstance(rows, list) else []
+
+        results = await asyncio.gather(
+            *(fetch_chunk(chunk) for chunk in _chunks(sorted(keys), _COOLDOWN_KEYS_PER_QUERY))
         )
-        response = await self._client.get(query)
-        response.raise_for_status()
-        rows = response.json()
-        return isinstance(rows, list) and bool(rows)
+        # Latest created_at per key, as epoch seconds (now when unparseable).
+        recent: dict[tuple[str, str, str], float] = {}
+        for rows in results:
+            for row in rows:
+                if not isinstance(row, dict):
+                    continue
+                key = (row.get("source_type"), row.get("source_id"), row.get("alert_type"))
+                if key not in keys:
+                    continue
+                created_at = _parse_epoch_seconds(row.get("created_at"))
+                if created_at > recent.get(key, 0.0):
+                    recent[key] = created_at
+        return recent
 
     async def aclose(self) -> None:
         await self._client.aclose()
@@ -887,18 +1434,8 @@ class SupabaseStorage:
                 "error_group": error_group,
                 "http_status_code": http_status_code,
                 "error_message": (error_message or "")[:1500],
-                "summary": {
-                    "categories_processed": int(summary.get("categories_processed", 0)),
-                    "courses_processed": int(summary.get("courses_processed", 0)),
-                    "status_rows_processed": int(summary.get("status_rows_processed", 0)),
-                    "details_processed": int(summary.get("details_processed", 0)),
-                    "source_records_upserted": int(summary.get("source_records_upserted", 0)),
-                    "new_records": int(summary.get("new_records", 0)),
-                    "changed_records": int(summary.get("changed_records", 0)),
-                    "created_alerts": int(summary.get("created_alerts", 0)),
-                    "failed_detail_calls": int(summary.get("failed_detail_calls", 0)),
-                    "failed_course_calls": int(summary.get("failed_course_calls", 0)),
-                },
+                # summary comes from summary_to_dict(SyncSummary); these fields are already ints.
+                "summary": {key: summary.get(key, 0) for key in _SUMMARY_INT_KEYS},
             },
             "review_status": "AUTO",
             "resolved": False,
@@ -915,20 +1452,22 @@ def create_storage(settings: Settings) -> Storage:
     return NoopStorage()
 
 
-def _chunks(items: list[dict[str, Any]], size: int) -> list[list[dict[str, Any]]]:
-    return [items[i : i + size] for i in range(0, len(items), size)]
-
+def _chunks(items: Iterable[_T], size: int) -> Iterator[list[_T]]:
+    # Lazy: one chunk exists at a time. Lists are sliced directly, other iterables via islice.
+    if isinstance(items, list):
+        for start in range(0, len(items), size):
+            yield items[start : start + size]
+        return
+    it = iter(items)
+    while chunk := list(islice(it, size)):
+        yield chunk
 
-def _chunks_text(items: list[str], size: int) -> list[list[str]]:
-    return [items[i : i + size] for i in range(0, len(items), size)]
 
-
-def _build_in_filter(values: list[str]) -> str:
-    quoted = []
-    for value in values:
-        escaped = value.replace("\\", "\\\\").replace('"', '\\"')
-        quoted.append(f'"{escaped}"')
-    return f"({','.join(quoted)})"
+def _build_in_filter(values: Iterable[str]) -> str:
+    # Returns the URL-ready `(...)` operand for PostgREST in.: values are double-quoted
+    # and escaped, then the whole list is percent-encoded in one quote() call.
+    raw = ",".join('"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"' for value in values)
+    return quote(f"({raw})", safe=_IN_FILTER_SAFE)
 
 
 def _is_truthy_timestamp(value: str | None) -> bool:
@@ -950,13 +1489,47 @@ def _determine_severity(alert_type: str, status: str | None, is_paid: bool, is_d
     return "medium"
 
 
+# _determine_severity only distinguishes status "DS" from everything else, so the whole
+# state space for NEW/CHANGED alerts fits in a 16-entry table built once at import.
+_ALERT_SEVERITY: dict[tuple[str, bool, bool, bool], str] = {
+    (alert_type, is_paid, is_doc_ready, is_ds): _determine_severity(
+        alert_type=alert_type,
+        status="DS" if is_ds else None,
+        is_paid=is_paid,
+        is_doc_ready=is_doc_ready,
+    )
+    for alert_type in ("NEW", "CHANGED")
+    for is_paid in (False, True)
+    for is_doc_ready in (False, True)
+    for is_ds in (False, True)
+}
+
+
+# SyncSummary counters copied into run failure alert details.
+_SUMMARY_INT_KEYS = (
+    "categories_processed",
+    "courses_processed",
+    "status_rows_processed",
+    "details_processed",
+    "source_records_upserted",
+    "new_records",
+    "changed_records",
+    "created_alerts",
+    "failed_detail_calls",
+    "failed_course_calls",
+)
+
+_TYPED_HTTP_STATUS_RE = re.compile(r"(?:Client|Server) error '([45]\d{2})")
+_HTTP_STATUS_RE = re.compile(r"\b([45]\d{2})\b")
+
+
 def _extract_http_status_code(error_message: str | None) -> int | None:
     if not error_message:
         return None
-    typed_match = re.search(r"(?:Client|Server) error '([45]\d{2})", error_message)
+    typed_match = _TYPED_HTTP_STATUS_RE.search(error_message)
     if typed_match:
         return int(typed_match.group(1))
-    fallback_match = re.search(r"\b([45]\d{2})\b", error_message)
+    fallback_match = _HTTP_STATUS_RE.search(error_message)
     if fallback_match:
         return int(fallback_match.group(1))
     return None
@@ -988,11 +1561,55 @@ def _determine_failure_severity(error_group: str) -> str:
     return "medium"
 
 
+def _response_json(response: httpx.Response) -> Any:
+    # orjson straight from the body bytes; httpx's response.json() goes through stdlib json.
+    return orjson.loads(response.content)
+
+
+def _is_missing_conflict_target(response: httpx.Response) -> bool:
+    # 42P10: no unique index matches on_conflict, i.e. the outbox key migration is missing.
+    return response.status_code == 400 and b"42P10" in response.content
+
+
+def _parse_epoch_seconds(value: Any) -> float:
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            pass
+    return time.time()
+
+
+def _build_sheet_outbox_row(alert_row: dict[str, Any]) -> dict[str, Any] | None:
+    source_type = _to_str(alert_row.get("source_type"))
+    source_id = _to_str(alert_row.get("source_id"))
+    alert_type = _to_str(alert_row.get("alert_type"))
+    if not source_type or not source_id or not alert_type:
+        return None
+    detail = alert_row.get("detail")
+    return {
+        "source_type": source_type,
+        "source_id": source_id,
+        "row_key": _build_alert_row_key(alert_row),
+        "payload": {
+            "source_type": source_type,
+            "source_id": source_id,
+            "alert_type": alert_type,
+            "severity": _to_str(alert_row.get("severity")) or "medium",
+            "title": _to_str(alert_row.get("title")),
+            "message": _to_str(alert_row.get("message")),
+            "detail": detail if isinstance(detail, dict) else {},
+        },
+    }
+
+
 def _build_alert_row_key(alert_row: dict[str, Any]) -> str:
     source_type = _to_str(alert_row.get("source_type")) or "unknown"
     source_id = _to_str(alert_row.get("source_id")) or "unknown"
     alert_type = _to_str(alert_row.get("alert_type")) or "UNKNOWN"
-    raw = json.dumps(
+    # orjson with sorted keys yields the same bytes as the compact sort_keys json.dumps
+    # form for these str/int dicts, so existing row keys stay stable.
+    raw = orjson.dumps(
         {
             "source_type": source_type,
             "source_id": source_id,
@@ -1001,11 +1618,9 @@ def _build_alert_row_key(alert_row: dict[str, Any]) -> str:
             "message": _to_str(alert_row.get("message")),
             "detail": alert_row.get("detail") if isinstance(alert_row.get("detail"), dict) else {},
         },
-        ensure_ascii=False,
-        sort_keys=True,
-        separators=(",", ":"),
+        option=orjson.OPT_SORT_KEYS,
     )
-    digest = hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+    digest = hashlib.sha256(raw).hexdigest()[:16]
     return f"{source_type}:{source_id}:{alert_type}:{digest}"
 
 
@@ -1025,6 +1640,8 @@ def _to_str(value: Any) -> str | None:
     return text if text else None
 
 
+# Table names, statuses and configured codes repeat on every call; timestamps just cycle out.
+@lru_cache(maxsize=1024)
 def _encode_eq_value(value: str) -> str:
     return quote(value, safe="")
 
@@ -1035,3 +1652,7 @@ def _utc_after(*, seconds: int = 0, minutes: int = 0) -> str:
 
 def _utc_now() -> str:
     return datetime.now(UTC).isoformat()
+
+
+def _utc_now_millis() -> str:
+    return datetime.now(UTC).isoformat(timespec="milliseconds")
@@ -1,19 +1,23 @@
 from __future__ import annotations
 
+import asyncio
 import hashlib
 import json
-from dataclasses import asdict, dataclass
+import logging
+from collections import Counter
+from dataclasses import dataclass, replace
 from datetime import UTC, datetime, timedelta, timezone
-from typing import Any
+from typing import Any, Callable, Coroutine, Iterable, TypeVar
 
 import httpx
+import orjson
 
 from .kvca_client import KVCAClient
 from .redaction import redact_sensitive
 from .storage import PersistResult, SourceRecordInput, Storage
 
 
-@dataclass
+@dataclass(slots=True)
 class SyncSummary:
     categories_processed: int = 0
     courses_processed: int = 0
@@ -30,10 +34,20 @@ class SyncSummary:
     finished_at: str = ""
 
 
+_KST = timezone(timedelta(hours=9))
+# Row count from which redaction/hashing of a batch runs in a worker thread.
+_OFFLOAD_MIN_ROWS = 500
+
+_T = TypeVar("_T")
+
+logger = logging.getLogger(__name__)
+
+
 class EnrolmentSyncService:
-    def __init__(self, client: KVCAClient, storage: Storage) -> None:
+    def __init__(self, client: KVCAClient, storage: Storage, concurrency: int = 8) -> None:
         self._client = client
         self._storage = storage
+        self._concurrency = max(1, concurrency)
 
     async def sync(
         self,
@@ -63,47 +77,25 @@ class EnrolmentSyncService:
             categories = await self._resolve_categories(category_id, max_categories)
             summary.categories_processed = len(categories)
 
-            source_records: list[SourceRecordInput] = []
-            for term_id in categories:
-                try:
-                    courses = await self._client.fetch_courses_by_category(term_id)
-                except httpx.HTTPStatusError as exc:
-                    if exc.response.status_code == 409:
-                        summary.failed_course_calls += 1
-                        continue
-                    raise
-                summary.courses_processed += len(courses)
-
-                for course in courses:
-                    course_id = _to_int(course.get("courseid") or course.get("id"))
-                    if course_id is None:
-                        continue
-
-                    rows = await self._client.fetch_class_status_all(course_id)
-                    if max_users_per_course is not None:
-                        rows = rows[:max_users_per_course]
-
-                    summary.status_rows_processed += len(rows)
-                    for row in rows:
-                        row_record = self._build_status_record(term_id=term_id, course_id=course_id, row=row)
-                        if row_record is None:
-                            continue
-                        source_records.append(row_record)
-
-                        user_id = row_record.user_id
-                        if not user_id:
-                            continue
-                        detail = await self._safe_fetch_detail(summary, term_id=term_id, user_id=user_id)
-                        if not detail:
-                            continue
-                        detail_record = self._build_detail_record(
-                            term_id=term_id,
-                            course_id=course_id,
-                            user_id=user_id,
-                            detail=detail,
+            # Categories run concurrently; one semaphore bounds all KVCA calls of this sync.
+            # A failure cancels the sibling categories instead of leaving them running.
+            semaphore = asyncio.Semaphore(self._concurrency)
+            try:
+                async with asyncio.TaskGroup() as tg:
+                    category_tasks = [
+                        tg.create_task(
+                            self._process_category(summary, term_id, max_users_per_course, semaphore)
                         )
-                        source_records.append(detail_record)
-                        summary.details_processed += 1
+                        for term_id in categories
+                    ]
+            except ExceptionGroup as group:
+                # Surface the original error so run_log/alert classification still sees it;
+                # the group stays attached as the cause and every failure is logged.
+                errors = _leaf_exceptions(group)
+                for error in errors:
+                    logger.error("Category sync failed", exc_info=error)
+                raise errors[0] from group
+            source_records = [record for task in category_tasks for record in task.result()]
 
             persist_result: PersistResult = await self._storage.upsert_source_records(source_records)
             summary.source_records_upserted = persist_result.upserted_count
@@ -146,11 +138,137 @@ class EnrolmentSyncService:
             ids = ids[:max_categories]
         return ids
 
-    async def _safe_fetch_detail(self, summary: SyncSummary, term_id: int, user_id: str) -> dict[str, Any]:
+    async def _process_category(
+        self,
+        summary: SyncSummary,
+        term_id: int,
+        max_users_per_course: int | None,
+        semaphore: asyncio.Semaphore,
+    ) -> list[SourceRecordInput]:
+        try:
+            async with semaphore:
+                courses = await self._client.fetch_courses_by_category(term_id)
+        except httpx.HTTPStatusError as exc:
+            if exc.response.status_code == 409:
+                summary.failed_course_calls += 1
+                return []
+            raise
+        summary.courses_processed += len(courses)
+
+        course_ids: list[int] = []
+        for course in courses:
+            course_id = _to_int(course.get("courseid") or course.get("id"))
+            if course_id is not None:
+                course_ids.append(course_id)
+        # Course status and user detail calls are independent; issue them concurrently,
+        # then assemble records in course/row order.
+        course_rows = await self._fetch_class_statuses(course_ids, semaphore)
+        if max_users_per_course is not None:
+            course_rows = [rows[:max_users_per_course] for rows in course_rows]
+        row_count = sum(map(len, course_rows))
+        summary.status_rows_processed += row_count
+        status_records = await _run_cpu_bound(
+            row_count, self._build_status_records, term_id, course_ids, course_rows
+        )
+
+        details = await self._fetch_details(
+            summary,
+            term_id=term_id,
+            user_ids=[row_record.user_id for _, row_record in status_records],
+            semaphore=semaphore,
+        )
+        source_records = await _run_cpu_bound(
+            len(status_records), self._merge_detail_records, term_id, status_records, details
+        )
+        summary.details_processed += len(source_records) - len(status_records)
+        return source_records
+
+    def _build_status_records(
+        self,
+        term_id: int,
+        course_ids: list[int],
+        course_rows: list[list[dict[str, Any]]],
+    ) -> list[tuple[int, SourceRecordInput]]:
+        status_records: list[tuple[int, SourceRecordInput]] = []
+        for course_id, rows in zip(course_ids, course_rows):
+            for row in rows:
+                row_record = self._build_status_record(term_id=term_id, course_id=course_id, row=row)
+                if row_record is None:
+                    continue
+                status_records.append((course_id, row_record))
+        return status_records
+
+    def _merge_detail_records(
+        self,
+        term_id: int,
+        status_records: list[tuple[int, SourceRecordInput]],
+        details: list[dict[str, Any]],
+    ) -> list[SourceRecordInput]:
+        source_records: list[SourceRecordInput] = []
+        # Redaction and hashing run once per user; other rows only swap the course_id.
+        built: dict[str, SourceRecordInput] = {}
+        for (course_id, row_record), detail in zip(status_records, details):
+            source_records.append(row_record)
+            if not detail:
+                continue
+            detail_record = built.get(row_record.user_id)
+            if detail_record is None:
+                detail_record = built[row_record.user_id] = self._build_detail_record(
+                    term_id=term_id,
+                    course_id=course_id,
+                    user_id=row_record.user_id,
+                    detail=detail,
+                )
+            elif detail_record.course_id != course_id:
+                detail_record = replace(detail_record, course_id=course_id)
+            source_records.append(detail_record)
+        return source_records
+
+    async def _fetch_class_statuses(
+        self,
+        course_ids: list[int],
+        semaphore: asyncio.Semaphore,
+    ) -> list[list[dict[str, Any]]]:
+        async def fetch(course_id: int) -> list[dict[str, Any]]:
+            async with semaphore:
+                return await self._client.fetch_class_status_all(course_id)
+
+        return await _gather_cancelling(fetch(course_id) for course_id in course_ids)
+
+    async def _fetch_details(
+        self,
+        summary: SyncSummary,
+        term_id: int,
+        user_ids: list[str | None],
+        semaphore: asyncio.Semaphore,
+    ) -> list[dict[str, Any]]:
+        # The detail depends only on (term_id, user_id); a user enrolled in several
+        # courses of the term is fetched once and shared by all of their rows. A failed
+        # fetch still counts once per row in failed_detail_calls.
+        row_counts = Counter(user_ids)
+
+        async def fetch(user_id: str) -> dict[str, Any]:
+            async with semaphore:
+                return await self._safe_fetch_detail(
+                    summary, term_id=term_id, user_id=user_id, row_count=row_counts[user_id]
+                )
+
+        unique_ids = [user_id for user_id in row_counts if user_id]
+        fetched = await _gather_cancelling(fetch(user_id) for user_id in unique_ids)
+        details = dict(zip(unique_ids, fetched))
+        return [details[user_id] if user_id else {} for user_id in user_ids]
+
+    async def _safe_fetch_detail(
+        self,
+        summary: SyncSummary,
+        term_id: int,
+        user_id: str,
+        row_count: int = 1,
+    ) -> dict[str, Any]:
         try:
             return await self._client.fetch_enrolment_user_info(term_id=term_id, user_id=user_id)
         except Exception:
-            summary.failed_detail_calls += 1
+            summary.failed_detail_calls += row_count
             return {}
 
     def _build_status_record(
@@ -222,9 +340,52 @@ class EnrolmentSyncService:
         )
 
 
+async def _gather_cancelling(coros: Iterable[Coroutine[Any, Any, _T]]) -> list[_T]:
+    # Like gather, but a failure cancels the siblings so none keep holding the semaphore.
+    async with asyncio.TaskGroup() as group:
+        tasks = [group.create_task(coro) for coro in coros]
+    return [task.result() for task in tasks]
+
+
+def _leaf_exceptions(group: BaseExceptionGroup) -> list[BaseException]:
+    errors: list[BaseException] = []
+    for error in group.exceptions:
+        if isinstance(error, BaseExceptionGroup):
+            errors.extend(_leaf_exceptions(error))
+        else:
+            errors.append(error)
+    return errors
+
+
+async def _run_cpu_bound(size: int, func: Callable[..., _T], /, *args: Any) -> _T:
+    # Large batches are built off the event loop so concurrent KVCA responses keep
+    # being read meanwhile; small ones are not worth the thread handoff.
+    if size >= _OFFLOAD_MIN_ROWS:
+        return await asyncio.to_thread(func, *args)
+    return func(*args)
+
+
 def _hash_payload(payload: dict[str, Any]) -> str:
-    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
-    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    # orjson matches the compact sort_keys json.dumps form except for floats (1e16 vs
+    # 1e+16, NaN vs null) and values it cannot encode (e.g. ints > 64 bit); those keep
+    # the json form so stored hashes stay valid.
+    raw: bytes | None = None
+    if not _contains_float(payload):
+        try:
+            raw = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+        except TypeError:
+            pass
+    if raw is None:
+        raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+def _contains_float(value: Any) -> bool:
+    if isinstance(value, dict):
+        return any(_contains_float(item) for item in value.values())
+    if isinstance(value, list):
+        return any(_contains_float(item) for item in value)
+    return isinstance(value, float)
 
 
 def _build_status_source_id(*, term_id: int, course_id: int, user_id: str) -> str:
@@ -234,6 +395,8 @@ def _build_status_source_id(*, term_id: int, course_id: int, user_id: str) -> st
 
 
 def _to_int(value: Any) -> int | None:
+    if type(value) is int:
+        return value
     if value is None:
         return None
     try:
@@ -243,6 +406,9 @@ def _to_int(value: Any) -> int | None:
 
 
 def _to_str(value: Any) -> str | None:
+    if type(value) is str:
+        text = value.strip()
+        return text if text else None
     if value is None:
         return None
     text = str(value).strip()
@@ -258,15 +424,58 @@ def _parse_kvca_datetime(value: Any) -> str | None:
     if not text or text.lower() == "empty":
         return None
 
-    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M:%S.%f"):
-        try:
-            naive = datetime.strptime(text, fmt)
-            kst = naive.replace(tzinfo=timezone(timedelta(hours=9)))
-            return kst.isoformat()
-        except ValueError:
-            continue
-    return None
+    naive = _parse_kvca_datetime_fast(text)
+    if naive is None:
+        for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M:%S.%f"):
+            try:
+                naive = datetime.strptime(text, fmt)
+                break
+            except ValueError:
+                continue
+        else:
+            return None
+    return naive.replace(tzinfo=_KST).isoformat()
+
+
+def _parse_kvca_datetime_fast(text: str) -> datetime | None:
+    # Fixed KVCA layout "YYYY-MM-DD HH:MM:SS[.f-ffffff]" by slicing; anything else
+    # (e.g. unpadded fields) is left to strptime.
+    length = len(text)
+    if length != 19 and not (21 <= length <= 26 and text[19] == "."):
+        return None
+    if text[4] != "-" or text[7] != "-" or text[10] != " " or text[13] != ":" or text[16] != ":":
+        return None
+    fraction = text[20:]
+    digits = text[0:4] + text[5:7] + text[8:10] + text[11:13] + text[14:16] + text[17:19] + fraction
+    if not digits.isascii() or not digits.isdigit():
+        return None
+    try:
+        return datetime(
+            int(text[0:4]),
+            int(text[5:7]),
+            int(text[8:10]),
+            int(text[11:13]),
+            int(text[14:16]),
+            int(text[17:19]),
+            int(fraction.ljust(6, "0")) if fraction else 0,
+        )
+    except ValueError:
+        return None
 
 
 def summary_to_dict(summary: SyncSummary) -> dict[str, Any]:
-    return asdict(summary)
+    return {
+        "categories_processed": summary.categories_processed,
+        "courses_processed": summary.courses_processed,
+        "status_rows_processed": summary.status_rows_processed,
+        "details_processed": summary.details_processed,
+        "source_records_upserted": summary.source_records_upserted,
+        "new_records": summary.new_records,
+        "changed_records": summary.changed_records,
+        "created_alerts": summary.created_alerts,
+        "failed_detail_calls": summary.failed_detail_calls,
+        "failed_course_calls": summary.failed_course_calls,
+        "lock_acquired": summary.lock_acquired,
+        "started_at": summary.started_at,
+        "finished_at": summary.finished_at,
+    }